@@ -2,6 +2,10 @@ from flask import Flask
 import os
 from dotenv import load_dotenv
 
+# Load the .env file once, before any module of the package reads its settings from the
+# environment (app/db.py and others read them when they are imported).
+load_dotenv()
+
 
 def create_app():
     """
@@ -14,25 +18,56 @@ def create_app():
     app = Flask(__name__)
 
     # Configure the secret key (used to provide cryptographic security).
-    load_dotenv()
     app.secret_key = os.getenv('SECRET_KEY')
 
     # Import all the blueprints.
     from .blackjack_views import blackjack_views
     from .blackjack_auth import auth
     from .views import views
+    from .internal_views import internal
+    from .media_views import media
 
     # Register the blueprints within the Flask application.
     app.register_blueprint(blackjack_views, url_prefix='/projects/blackjack')
     app.register_blueprint(auth, url_prefix='/projects/blackjack')
     app.register_blueprint(views, url_prefix='/')
+    app.register_blueprint(internal, url_prefix='/internal')
+    app.register_blueprint(media, url_prefix='/media')
+
+    # Return each request's database connection to the pool when the request ends.
+    from . import db
+    db.init_app(app)
+
+    # Serve the static files under content-hashed URLs, precompressed where possible.
+    from . import assets
+    assets.init_app(app)
+
+    # Compress the dynamic HTML and JSON responses.
+    from . import compression
+    compression.init_app(app)
 
     # Return the Flask application.
     return app
 
+def preload(app: Flask):
+    """
+    Do the start-up work that every gunicorn worker would otherwise repeat, in the master
+    process before it forks, so the workers share the result through copy-on-write memory.
+    The blueprints, SQL statement registry and asset manifest are loaded by `create_app`;
+    this compiles every template. Called by the `when_ready` hook in gunicorn.conf.py.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
 def create_tables():
     """
-    Create database tables.
+    Create the database tables, or migrate existing ones to the latest schema.
     """
     from .db import create_tables
-    create_tables()
+
+    # The tables are created with a pooled connection, which requires an application context.
+    with create_app().app_context():
+        create_tables()
@@ -0,0 +1,268 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, List, Optional
+import click
+from flask import Flask, current_app, request, send_from_directory
+
+# Brotli is optional; without it only gzip variants are built.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ===========================
+# Static asset manifest
+# ===========================
+
+# The file the manifest is written to, relative to the static folder.
+MANIFEST_FILENAME = 'manifest.json'
+
+# The number of hexadecimal digits of the content hash added to each filename.
+HASH_LENGTH = 12
+
+# The text assets that are precompressed, and the smallest file worth compressing (in bytes).
+# Images, videos and woff2 fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.svg', '.glsl', '.html', '.txt', '.ico',
+                           '.ttf', '.otf'}
+MIN_COMPRESS_SIZE = 1024
+
+# The content encodings assets are precompressed with and the suffix of each variant, in the
+# order they are preferred.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# The Cache-Control max-age (in seconds) of hashed URLs, whose content never changes.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def hashed_filename(filename: str, digest: str) -> str:
+    """
+    Adds a content hash to a filename, before its extension.
+
+    Args:
+        filename (str): The path of the file, relative to the static folder.
+        digest (str): The hexadecimal content hash of the file.
+
+    Returns:
+        str: The hashed filename.
+
+    Example:
+        >>> hashed_filename("home/home.css", "3f2a1b9c8d7e6f5a...")
+        'home/home.3f2a1b9c8d7e.css'
+    """
+    root, extension = os.path.splitext(filename)
+    return f"{root}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def compress_file(path: str) -> List[str]:
+    """
+    Writes the precompressed variants of a file next to it (e.g. `home.css.gz`). A variant is
+    only kept if it is smaller than the file itself.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        List[str]: The content encodings the file was precompressed with.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    encodings = []
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br":
+            if brotli is None:
+                continue
+            compressed = brotli.compress(data, quality=11)
+        else:
+            # The modification time is left out, so rebuilding an unchanged file gives the same bytes.
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+            encodings.append(encoding)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return encodings
+
+
+def build_manifest(static_folder: str) -> Dict[str, Dict]:
+    """
+    Fingerprints every file in the static folder, precompresses the text assets and writes
+    the manifest mapping each file to its hashed filename and precompressed encodings.
+
+    This is run as part of a deploy, after the frontend has been built, with
+    `flask --app main build-assets`.
+
+    Args:
+        static_folder (str): The path of the static folder.
+
+    Returns:
+        Dict[str, Dict]: The manifest. For each file (relative to the static folder, with
+                         forward slashes), its "hashed" filename and "encodings".
+
+    Example:
+        >>> build_manifest("app/static")["home/home.css"]
+        {'hashed': 'home/home.3f2a1b9c8d7e.css', 'encodings': ['br', 'gzip']}
+    """
+    manifest = {}
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+
+    for directory, _, filenames in os.walk(static_folder):
+        for name in sorted(filenames):
+            path = os.path.join(directory, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+
+            # Skips the manifest and the precompressed variants written by earlier builds.
+            if filename == MANIFEST_FILENAME or name.endswith(suffixes):
+                continue
+
+            # Hashes the file in blocks, since the videos are several megabytes.
+            digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(block)
+
+            encodings = []
+            if (os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+                    and os.path.getsize(path) >= MIN_COMPRESS_SIZE):
+                encodings = compress_file(path)
+
+            manifest[filename] = {
+                "hashed": hashed_filename(filename, digest.hexdigest()),
+                "encodings": encodings,
+            }
+
+    with open(os.path.join(static_folder, MANIFEST_FILENAME), 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+
+    return manifest
+
+
+def load_manifest(static_folder: str) -> Dict[str, Dict]:
+    """
+    Reads the manifest written by `build_manifest`.
+
+    Args:
+        static_folder (str): The path of the static folder.
+
+    Returns:
+        Dict[str, Dict]: The manifest, or an empty dictionary if the assets have not been built,
+                         in which case static files are served under their own names.
+    """
+    try:
+        with open(os.path.join(static_folder, MANIFEST_FILENAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+# ===========================
+# Serving static assets
+# ===========================
+def init_app(app: Flask):
+    """
+    Loads the asset manifest, makes `url_for('static', ...)` emit hashed URLs, replaces the
+    static view with `serve_static` and registers the `build-assets` command.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    manifest = load_manifest(app.static_folder)
+    app.extensions['assets'] = {
+        "manifest": manifest,
+        "originals": {entry["hashed"]: filename for filename, entry in manifest.items()},
+    }
+    app.url_defaults(hashed_static_url)
+    app.view_functions['static'] = serve_static
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint and precompress the static assets."""
+        manifest = build_manifest(app.static_folder)
+        compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+        click.echo(f"Wrote {MANIFEST_FILENAME}: {len(manifest)} files, {compressed} precompressed"
+                   + ("" if brotli is not None else " (gzip only, brotli is not installed)"))
+
+
+def hashed_static_url(endpoint: str, values: dict):
+    """
+    Replaces the filename of a static URL with its hashed filename, if it is in the manifest.
+    Registered as a URL defaults function, so it applies to every `url_for('static', ...)`.
+    Files are served under their own names in debug mode, so changes show up straight away.
+
+    Args:
+        endpoint (str): The endpoint the URL is built for.
+        values (dict): The values the URL is built from.
+
+    Example:
+        >>> url_for('static', filename='home/home.css')
+        '/static/home/home.3f2a1b9c8d7e.css'
+    """
+    if endpoint != 'static' or current_app.debug:
+        return
+    entry = current_app.extensions['assets']["manifest"].get(values.get('filename'))
+    if entry is not None:
+        values['filename'] = entry["hashed"]
+
+
+def choose_encoding(encodings: List[str]) -> Optional[str]:
+    """
+    Chooses the precompressed variant to send, based on the request's Accept-Encoding header.
+
+    Args:
+        encodings (List[str]): The encodings the file has been precompressed with.
+
+    Returns:
+        Optional[str]: The preferred encoding the client accepts, or None to send the file as is.
+    """
+    for encoding, _ in ENCODINGS:
+        if encoding in encodings and request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def serve_static(filename: str):
+    """
+    Serves a file from the static folder. Hashed URLs are cached by browsers for a year, since
+    their content never changes, and text assets are sent precompressed when the client
+    accepts it. Other files are served as before.
+
+    Args:
+        filename (str): The path of the file (or its hashed filename), relative to the static folder.
+
+    Returns:
+        The file response.
+    """
+    assets = current_app.extensions['assets']
+    original = assets["originals"].get(filename)
+    entry = assets["manifest"].get(original or filename)
+
+    # Serves the file as before if it has not been through the asset build.
+    if entry is None or current_app.debug:
+        return send_from_directory(current_app.static_folder, filename)
+
+    # Sends the precompressed variant with the original file's content type.
+    encoding = choose_encoding(entry["encodings"])
+    if encoding is not None:
+        suffix = dict(ENCODINGS)[encoding]
+        response = send_from_directory(current_app.static_folder, (original or filename) + suffix,
+                                       mimetype=mimetypes.guess_type(original or filename)[0] or 'application/octet-stream')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(current_app.static_folder, original or filename)
+
+    # Caches are told the response depends on Accept-Encoding if there is a compressed variant.
+    if entry["encodings"]:
+        response.vary.add('Accept-Encoding')
+
+    if original is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
@@ -1,6 +1,6 @@
 # Define routes and handle user requests
 from flask import Blueprint, render_template, request, flash, url_for, redirect, session
-from .db import add_user, get_account_information, validate_password, validate_username
+from .db import PasswordHasherBusy, add_user, authenticate
 
 # Renders all the routes in a blueprint.
 auth = Blueprint("auth", __name__)
@@ -21,6 +21,7 @@ def remove_game_id():
         # Removes the game_id from the session if the user has left the game.
         if request.endpoint != session["table"]:
             session.pop('game_id', None)
+            session.pop('game_stats', None)
     except KeyError:
         # Ignore the error if 'table' is not set in the session.
         pass
@@ -44,22 +45,22 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        # Check if username exists.
-        user_exists = validate_username(username)
-
-        # Checks if the user exists and flashes an error if they do not.
-        if user_exists is False:
-            flash('User does not exist', category='error,login')
-        elif user_exists is True:
-            # Since the username exists, check if the password is correct.
-            password_correct = validate_password(username, password)
-            if password_correct is True:
-                # If the password is correct, get user information and store it in session.
-                user = get_account_information(username)
+        # Checks the username and password and gets the account information with a single query.
+        try:
+            account = authenticate(username, password)
+        except PasswordHasherBusy:
+            # Too many passwords are being checked, so the user is asked to try again.
+            flash('Too many people are logging in, please try again shortly', category='error,login')
+        else:
+            # Checks if the user exists and flashes an error if they do not.
+            if account is None:
+                flash('User does not exist', category='error,login')
+            elif account["password_correct"]:
+                # If the password is correct, store the user information in session.
                 flash('Login successful!', category='success,login')
                 session['username'] = username
-                session['user_id'] = user["user_id"]
-            elif password_correct is False:
+                session['user_id'] = account["user_id"]
+            else:
                 # If the password is incorrect, flash an error message.
                 flash('Incorrect password', category='error,login')
 
@@ -111,16 +112,20 @@ def signup():
             flash('Passwords do not match', category='error,signup')
         else:
             # Attempt to add the user with the provided information.
-            registered = add_user(username, password1)
-            if registered:
-                # User registration successful, flash success message and store user info in session.
-                flash('Account created!', category="success,signup")
-                user_information = get_account_information(username)
-                session['username'] = username
-                session['user_id'] = user_information['user_id']
+            try:
+                account = add_user(username, password1)
+            except PasswordHasherBusy:
+                # Too many passwords are being hashed, so the user is asked to try again.
+                flash('Too many people are signing up, please try again shortly', category='error,signup')
             else:
-                # Username already exists, flash error message.
-                flash('Username already exists.', category='error,signup')
+                if account is not None:
+                    # User registration successful, flash success message and store user info in session.
+                    flash('Account created!', category="success,signup")
+                    session['username'] = username
+                    session['user_id'] = account['user_id']
+                else:
+                    # Username already exists, flash error message.
+                    flash('Username already exists.', category='error,signup')
 
     # Renders the HTML template.
     return render_template('projects/blackjack/auth/sign-up.html')
@@ -1,12 +1,37 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from flask import (Blueprint, Response, abort, render_template, session, redirect, stream_with_context,
+                   url_for, request, flash, jsonify)
 from .db import *
-from .sort import sort_rows
+from .response_cache import response_cache
+import csv
 import datetime
+import io
+import json
 import math
+from typing import Optional, Tuple
 
 # Renders all the routes in a blueprint.
 blackjack_views = Blueprint("blackjack_views", __name__, url_prefix='projects/blackjack')
 
+# The number of games shown on each page of the game history.
+GAMES_PER_PAGE = 7
+
+# The media type of each format the game history can be exported in, and the exported columns.
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_COLUMNS = ["date", "time", "number_of_hands", "net_profit_loss", "average_profit_loss", "game_table"]
+
+# The index of each sort column in the rows returned by `get_all_games`.
+GAME_SORT_COLUMNS = {
+    "date": 0,
+    "time": 1,
+    "num_of_hands": 2,
+    "net_profit_loss": 3,
+    "average_profit_loss": 4,
+    "game_stakes": 5
+}
+
 
 # =================
 # General functions
@@ -20,9 +45,11 @@ def remove_game_id():
     table and if they are different, it removes the 'game_id' from the session.
     """
     try:
-        # Removes the game_id from the session if the user has left the game.
-        if request.endpoint != session["table"]:
+        # Removes the game_id from the session if the user has left the game. Recording a
+        # hand does not leave the table.
+        if request.endpoint not in (session["table"], 'blackjack_views.hand'):
             session.pop('game_id', None)
+            session.pop('game_stats', None)
     except KeyError:
         # Ignore the error if 'table' is not set in the session
         pass
@@ -89,6 +116,7 @@ def menu():
 # Menu items functions
 # ====================
 @blackjack_views.route('/menu/rules')
+@response_cache.cached
 def rules():
     """
     Renders the game rules page template.
@@ -126,6 +154,7 @@ def tables():
 
 
 @blackjack_views.route('/menu/tutorials')
+@response_cache.cached
 def tutorials():
     """
     Renders the tutorials page template.
@@ -138,6 +167,7 @@ def tutorials():
 
 
 @blackjack_views.route('/menu/account')
+@read_only
 def account():
     """
     Renders the game rules page template.
@@ -171,53 +201,44 @@ def game_history():
     """
     # Checks if the user is logged in.
     if 'username' in session:
-        # Gets all the games from the database.
-        games = get_all_games(session['user_id'])
-
-        # Defines the parameters to be passesed into the sort function for each sort type.
-        sorted_games = {
-            "ascending_date": (games, 0),
-            "descending_date": (games, 0, True),
-            "ascending_time": (games, 1),
-            "descending_time": (games, 1, True),
-            "ascending_num_of_hands": (games, 2),
-            "descending_num_of_hands": (games, 2, True),
-            "ascending_net_profit_loss": (games, 3),
-            "descending_net_profit_loss": (games, 3, True),
-            "ascending_average_profit_loss": (games, 4),
-            "descending_average_profit_loss": (games, 4, True),
-            "ascending_game_stakes": (games, 5),
-            "descending_game_stakes": (games, 5, True)
-        }
-
-        # Getting the values for page_num and sort_type.
+        # Getting the values for page_num, sort_type and the keys of the first and last games on the page.
         page_num = session.get('page_num', 1)
         sort_type = session.get('sort_type', 'ascending_date')
+        page_keys = session.get('page_keys')
+        change_page = None
 
-        # Handling POST request to update page_num and sort_type.
+        # Handling POST request to update page_num and sort_type. Changing the sort type
+        # returns to the first page.
         if request.method == 'POST':
-            sort_type = request.form.get('sort_type', sort_type)
-            change_page = request.form.get('page_num', page_num)
-
-            if change_page == '+':
-                page_num += 1
-            elif change_page == '-':
-                page_num -= 1
-
-        # Calculate the maximum page number based on the length of games.
-        max_page_num = max(1, math.ceil(len(games) / 7))
-
-        # Ensure page_num doesn't go below 1.
-        page_num = max(page_num, 1)
-
-        # Ensure page_num doesn't exceed the maximum page number.
-        page_num = min(page_num, max_page_num)
-
-        # Sorts the games with the parameters from the sort type.
-        sorted_rows = sort_rows(*sorted_games[sort_type])
+            new_sort_type = request.form.get('sort_type', sort_type)
+            change_page = request.form.get('page_num')
+            if new_sort_type != sort_type:
+                sort_type = new_sort_type
+                page_num = 1
+                page_keys = None
+                change_page = None
+
+        # Splits the sort type into its direction and column (e.g. "descending" and "date"),
+        # falling back to the default sort type if it is not recognised.
+        direction, _, sort_column = sort_type.partition('_')
+        if direction not in ('ascending', 'descending') or sort_column not in GAME_SORT_KEYS:
+            sort_type, direction, sort_column = 'ascending_date', 'ascending', 'date'
+            page_num, page_keys = 1, None
+        descending = direction == 'descending'
+
+        # Gets the page from the user's cached game history if it fits in the cache, otherwise
+        # sorts and paginates the games in the database.
+        user_id = session['user_id']
+        entry = history_cache.get(user_id, lambda: load_history(user_id))
+        if entry is not None:
+            games, keys, page_num = cached_history_page(
+                entry, sort_column, descending, page_num, change_page)
+        else:
+            games, keys, page_num = database_history_page(
+                user_id, sort_column, descending, page_num, change_page, page_keys)
 
         # Formats the date and time into day, month, year and hours, minutes, respectively.
-        for game in sorted_rows:
+        for game in games:
             if isinstance(game[0], datetime.date) and isinstance(game[1], datetime.time):
                 game[0] = game[0].strftime("%d-%m-%Y")
                 game[1] = game[1].strftime("%H:%M")
@@ -225,14 +246,165 @@ def game_history():
         # Update session with the new values.
         session['page_num'] = page_num
         session['sort_type'] = sort_type
+        session['page_keys'] = [keys[0], keys[-1]] if keys else None
 
         # Renders the HTML template.
-        return render_template('projects/blackjack/menu/game-history.html', games=sorted_rows, page_num=page_num)
+        return render_template('projects/blackjack/menu/game-history.html', games=games, page_num=page_num)
     else:
         # If the user is not logged in (guest), render the guest menu template
         return redirect(url_for('blackjack_views.menu'))
 
 
+def load_history(user_id: int) -> Tuple[list[list], list[list]]:
+    """
+    Gets every game the given user has played for the game history cache, writing any buffered
+    hands first so the cached history includes them.
+
+    Args:
+        user_id (int): The user_id of the user whose games are requested.
+
+    Returns:
+        Tuple[list[list], list[list]]: The games and their keys, as returned by `get_games_page`.
+    """
+    flush_writes()
+    return get_games_page(user_id)
+
+
+def cached_history_page(entry, sort_column: str, descending: bool, page_num: int,
+                        change_page: Optional[str]) -> Tuple[list[list], list[list], int]:
+    """
+    Gets a page of the game history from the user's cached games, sorted in Python using the
+    sort orders stored in the cache.
+
+    Args:
+        entry (HistoryEntry): The user's cached game history.
+        sort_column (str): The column to sort by, one of the keys of `GAME_SORT_COLUMNS`.
+        descending (bool): If True, sort in descending order.
+        page_num (int): The page currently displayed.
+        change_page (Optional[str]): '+' to move to the next page, '-' to move to the previous page.
+
+    Returns:
+        Tuple[list[list], list[list], int]: The games in the page, their keys and the page number.
+    """
+    # Calculate the maximum page number based on the number of games.
+    max_page_num = max(1, math.ceil(len(entry.rows) / GAMES_PER_PAGE))
+
+    # Moves to the requested page, keeping page_num between 1 and the maximum page number.
+    if change_page == '+':
+        page_num += 1
+    elif change_page == '-':
+        page_num -= 1
+    page_num = min(max(page_num, 1), max_page_num)
+
+    # Gets the games in the page.
+    games, keys = history_cache.page(entry, GAME_SORT_COLUMNS[sort_column], descending,
+                                     (page_num - 1) * GAMES_PER_PAGE, GAMES_PER_PAGE)
+    return games, keys, page_num
+
+
+def database_history_page(user_id: int, sort_column: str, descending: bool, page_num: int,
+                          change_page: Optional[str],
+                          page_keys: Optional[list]) -> Tuple[list[list], list[list], int]:
+    """
+    Gets a page of the game history sorted and paginated by the database, seeking from the
+    keys of the first and last games on the current page.
+
+    Args:
+        user_id (int): The user_id of the user whose games are requested.
+        sort_column (str): The column to sort by, one of the keys of `GAME_SORT_KEYS`.
+        descending (bool): If True, sort in descending order.
+        page_num (int): The page currently displayed.
+        change_page (Optional[str]): '+' to move to the next page, '-' to move to the previous page.
+        page_keys (Optional[list]): The keys of the first and last games on the current page.
+
+    Returns:
+        Tuple[list[list], list[list], int]: The games in the page, their keys and the page number.
+    """
+    # Writes any buffered hands before the games are read, so the page includes them.
+    flush_writes()
+
+    # Calculate the maximum page number based on the number of games.
+    max_page_num = max(1, math.ceil(count_games(user_id) / GAMES_PER_PAGE))
+
+    # Seeks from the edge of the current page to the requested page, or reloads the current page.
+    seek, key = None, None
+    if page_keys is not None:
+        if change_page == '+' and page_num < max_page_num:
+            seek, key = 'after', page_keys[1]
+            page_num += 1
+        elif change_page == '-' and page_num > 1:
+            seek, key = 'before', page_keys[0]
+            page_num -= 1
+        else:
+            seek, key = 'from', page_keys[0]
+    else:
+        page_num = 1
+
+    # Gets the page of games from the database, returning to the first page if the games
+    # have changed so that the page is now empty.
+    games, keys = get_games_page(user_id, sort_column, descending, seek, key, GAMES_PER_PAGE)
+    if not games and seek is not None:
+        page_num = 1
+        games, keys = get_games_page(user_id, sort_column, descending, limit=GAMES_PER_PAGE)
+
+    return games, keys, page_num
+
+
+@blackjack_views.route('/menu/game-history/export.<file_format>')
+def export_game_history(file_format: str):
+    """
+    Downloads the user's whole game history as CSV or newline-delimited JSON. The games are
+    streamed from a server-side cursor in batches, so memory use does not grow with the
+    number of games.
+
+    Args:
+        file_format (str): Either 'csv' or 'ndjson'.
+
+    Returns:
+        A streamed download of the game history, or a redirect to the menu for guests.
+    """
+    # Redirects guests to the menu.
+    if 'username' not in session:
+        return redirect(url_for('blackjack_views.menu'))
+    if file_format not in EXPORT_FORMATS:
+        abort(404)
+
+    user_id = session['user_id']
+
+    # Writes any buffered hands before the export's cursor is opened, so the export includes them.
+    flush_writes()
+
+    def export_rows():
+        # Formats the date and time of each game, one batch at a time.
+        for games in stream_games(user_id):
+            yield [(game[0].isoformat(), game[1].strftime("%H:%M:%S"), *game[2:]) for game in games]
+
+    def generate_csv():
+        # Writes each batch into a reused buffer and sends it.
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in export_rows():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        # Sends one JSON object per game.
+        for rows in export_rows():
+            yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows)
+
+    # Keeps the request (and its database connection) open until the last batch has been sent.
+    generate = generate_csv if file_format == 'csv' else generate_ndjson
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[file_format],
+        headers={"Content-Disposition": f"attachment; filename=game-history.{file_format}"}
+    )
+
+
 # ================
 # Tables functions
 # ================
@@ -250,6 +422,9 @@ def table(table_stakes: str, practice: bool = False):
         KeyError: If `table_stakes` is not one of 'low', 'medium', or 'high'.
         Redirect: If the user is not logged in or does not have enough funds in their wallet.
     """
+    # Guests and the practice table play with a wallet of 100.
+    player_wallet = 100
+
     # Checks if the user is logged in.
     if 'username' in session:
         if practice == False:
@@ -261,61 +436,39 @@ def table(table_stakes: str, practice: bool = False):
             }[table_stakes]
 
             # Adds the endpoint to the session so that it can be accessed by the `remove_game_id` function.
-            session['table'] = f"views.{table_stakes}_stakes_table"
+            session['table'] = f"blackjack_views.{table_stakes}_stakes_table"
+
+            # Gets the wallet from the database rather than the wallet cache. board.js sends
+            # the wallet back after each hand, so a wallet cached by this process that is older
+            # than one committed by another worker would overwrite it.
+            player_wallet = get_wallet(session['user_id'], cached=False)
 
             # Checks if the user has enough funds in their wallet.
-            if get_wallet(session['user_id']) < min_bet:
+            if player_wallet < min_bet:
                 # If the user does not have enough funds, it redirects them to the tables menu and displays an error message.
                 error_message = "You do not have enough funds in your wallet."
                 session['error_message'] = error_message
                 return redirect(url_for('blackjack_views.tables'))
-            # Checks if data is being sent in the request.
-            elif request.method == 'POST':
-                # Gets the data sent in the request.
-                user_id = session['user_id']
-                username = request.form.get('username')
-                wallet = request.form.get('wallet')
-                profit_loss = request.form.get('profit_loss')
-
-                # Checks if the data being sent is from an ongoing game or a new game.
-                if 'game_id' not in session:
-                    # If it's a new game, it creates a new game in the database and stores
-                    # the  `game_id` in the session.
-                    game_id = create_game(user_id, table_stakes.capitalize())
-                    session['game_id'] = game_id
-                    add_game_stats(game_id)
-
-                # Gets the current game stats from the database.
-                game_stats = get_game_stats(session['game_id'])
-
-                # Calculates the new game stats using the POST request data.
-                net_profit_loss = game_stats["net_profit_loss"] + \
-                    int(profit_loss)
-                average_profit_loss = net_profit_loss // (
-                    game_stats["number_of_hands"] + 1)
-
-                # Updates the game stats in the databse using the new game stats.
-                update_game_stats(session['game_id'],
-                                  net_profit_loss, average_profit_loss)
-
-                # Updates the users wallet with the new value.
-                update_wallet(wallet, session['user_id'])
-
-    # Gets the player username and wallet to pass into the HTML template.
-    player_wallet = get_account_information(session['username'])[
-        'wallet'] if ('username' in session and practice == False) else 100
+
+    # Gets the player username to pass into the HTML template.
     player_username = session['username'] if (
         'username' in session) else "Guest"
 
+    # Gets the URL that each hand is recorded at (hands on the practice table are not recorded).
+    hand_url = url_for('blackjack_views.hand', table_stakes=table_stakes) if (
+        'username' in session and practice == False) else ""
+
     # Renders the HTML template using the username, wallet and table_stakes.
     return render_template('projects/blackjack/board.html',
                            page="tables",
                            table_stakes=table_stakes,
                            player_username=player_username,
-                           player_wallet=player_wallet)
+                           player_wallet=player_wallet,
+                           hand_url=hand_url)
 
 
-@blackjack_views.route('/menu/tables/low-stakes-table', methods=['GET', 'POST'])
+@blackjack_views.route('/menu/tables/low-stakes-table')
+@read_only
 def low_stakes_table():
     """
     Renders the board page template with low stakes.
@@ -327,7 +480,8 @@ def low_stakes_table():
     return table('low')
 
 
-@blackjack_views.route('/menu/tables/medium-stakes-table', methods=['GET', 'POST'])
+@blackjack_views.route('/menu/tables/medium-stakes-table')
+@read_only
 def medium_stakes_table():
     """
     Renders the board page template with low stakes.
@@ -339,7 +493,8 @@ def medium_stakes_table():
     return table('medium')
 
 
-@blackjack_views.route('/menu/tables/high-stakes-table', methods=['GET', 'POST'])
+@blackjack_views.route('/menu/tables/high-stakes-table')
+@read_only
 def high_stakes_table():
     """
     Renders the board page template with low stakes.
@@ -351,6 +506,71 @@ def high_stakes_table():
     return table('high')
 
 
+@blackjack_views.route('/menu/tables/<table_stakes>-stakes-table/hand', methods=['POST'])
+def hand(table_stakes: str):
+    """
+    Records a hand played on one of the stakes tables. The game stats and the user's wallet
+    are updated in a single statement and only the new values are returned, so board.js does
+    not need the board to be re-rendered.
+
+    Args:
+        table_stakes (str): The stakes of the table, can be 'low', 'medium', or 'high'.
+
+    Returns:
+        JSON: The new wallet and game stats, e.g.
+            {"wallet": 120, "game_stats": {"number_of_hands": 1, "net_profit_loss": 20, "average_profit_loss": 20}}
+        JSON error: If the user is not logged in (401), the table does not exist (404), the
+                    hand data is invalid (400) or the user has no wallet to update (500).
+    """
+    # Checks the user is logged in and the table exists.
+    if 'username' not in session:
+        return jsonify(error="You must be logged in to record a hand."), 401
+    if table_stakes not in ('low', 'medium', 'high'):
+        return jsonify(error="Table not found."), 404
+
+    # Gets the data sent in the request.
+    try:
+        wallet = int(request.form['wallet'])
+        profit_loss = int(request.form['profit_loss'])
+    except (KeyError, ValueError):
+        return jsonify(error="The hand must include an integer wallet and profit_loss."), 400
+
+    # Adds the hand to the write-behind buffer (if it is enabled) when the game is already underway.
+    game_id = session.get('game_id')
+    hand = None
+    if game_id is not None and 'game_stats' in session:
+        hand = buffer_hand(session['user_id'], game_id, session['game_stats'], profit_loss, wallet)
+
+    # Otherwise, records the hand in the current game, or in a new game if the user has just
+    # sat down or the game in the session no longer exists.
+    if hand is None:
+        hand = record_hand(session['user_id'], game_id, table_stakes.capitalize(), profit_loss, wallet)
+    if hand is None and game_id is not None:
+        hand = record_hand(session['user_id'], None, table_stakes.capitalize(), profit_loss, wallet)
+
+    # Returns an error if the hand could not be recorded. The failed request's transaction is
+    # rolled back, so a game created without a wallet to update is not kept.
+    if hand is None or hand["wallet"] is None:
+        return jsonify(error="The hand could not be recorded."), 500
+
+    # Removes the user's cached game history once the hand is committed, since it no longer
+    # includes every hand. A buffered hand is written by the next load, since the game history
+    # page calls `flush_writes` before reading the games from the database.
+    after_commit(history_cache.invalidate, session['user_id'])
+
+    # Stores the `game_id` and game stats so the following hands are added to the same game.
+    game_stats = {
+        "number_of_hands": hand["number_of_hands"],
+        "net_profit_loss": hand["net_profit_loss"],
+        "average_profit_loss": hand["average_profit_loss"]
+    }
+    session['game_id'] = hand["game_id"]
+    session['game_stats'] = game_stats
+
+    # Returns the new wallet and game stats.
+    return jsonify(wallet=hand["wallet"], game_stats=game_stats)
+
+
 @blackjack_views.route('/menu/tables/practice-table')
 def practice_table():
     """
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Union
+
+
+# ===========================
+# Read-through cache class
+# ===========================
+class TTLCache:
+    """
+    An in-process cache that keeps at most `max_entries` values, each for at most `ttl` seconds,
+    evicting the least recently used value when it is full.
+
+    Reads use `lookup` and, on a miss, `fill` with the value read from the database. Writes use
+    `set` or `invalidate`. A fill is ignored if a write happened since the generation it was
+    read at, so a slow read cannot put back a value that a concurrent write has just replaced.
+
+    The cache only sees writes made by its own process, so `ttl` bounds how long another
+    process's write can go unnoticed.
+
+    Args:
+        max_entries (int): The maximum number of values kept. 0 disables the cache.
+        ttl (float): The number of seconds a value is kept for. 0 disables the cache.
+
+    Example:
+        >>> cache = TTLCache(10000, 30)
+        >>> generation = cache.generation
+        >>> cache.lookup(1)
+        None
+        >>> cache.fill(1, 100, generation)
+        >>> cache.lookup(1)
+        100
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        # Counters used to size the cache.
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @property
+    def generation(self) -> int:
+        """
+        The number of writes made so far, read before loading a value to pass to `fill`.
+        """
+        return self._generation
+
+    def lookup(self, key: Hashable) -> Optional[Any]:
+        """
+        Gets the cached value for the key, marking it as recently used.
+
+        Args:
+            key (Hashable): The key of the value.
+
+        Returns:
+            Optional[Any]: The value, or None if it is not cached or has expired.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[1]:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+
+            # Removes the expired value.
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def _store(self, key: Hashable, value: Any):
+        """
+        Stores the value, evicting the least recently used values if the cache is full.
+        Must be called with the lock held.
+        """
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def fill(self, key: Hashable, value: Any, generation: int):
+        """
+        Stores a value read from the database after a miss.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value read from the database.
+            generation (int): The cache's `generation` before the value was read. The value is
+                              not stored if anything has been written to the cache since.
+        """
+        if not self.enabled or value is None:
+            return
+
+        with self._lock:
+            if self._generation == generation:
+                self._store(key, value)
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Stores a value that has just been written to the database.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The new value.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._generation += 1
+            self._store(key, value)
+
+    def invalidate(self, key: Hashable):
+        """
+        Removes the value for the key, e.g. after it has changed in a way the caller cannot compute.
+
+        Args:
+            key (Hashable): The key of the value.
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the cache's counters.
+
+        Returns:
+            Dict[str, Union[int, float]]: A dictionary containing the following keys:
+                - "entries" (int): The number of values cached.
+                - "max_entries" (int): The maximum number of values kept.
+                - "hits" (int): The number of lookups served from the cache.
+                - "misses" (int): The number of lookups that had to read the database.
+                - "evictions" (int): The number of values evicted to make room.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,216 @@
+import os
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from flask import Flask, Response, request
+from werkzeug.http import parse_accept_header
+
+
+# ===========================
+# Response compression
+# ===========================
+
+# The zlib compression level (1-9) and the smallest response (in bytes) worth compressing.
+COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))
+
+# The content types that are compressed. Images, videos and fonts are already compressed.
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "image/svg+xml",
+}
+
+# The zlib window bits of each content encoding, in the order they are preferred.
+ENCODINGS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+# The WSGI environ key the Content-Type and Content-Length of a 304 Not Modified response are
+# kept under, since they are removed from the response before it reaches the middleware.
+NOT_MODIFIED_HEADERS = 'app.compression.not_modified_headers'
+
+
+def init_app(app: Flask):
+    """
+    Wraps the application in `CompressionMiddleware` and registers `keep_not_modified_headers`,
+    so 304 Not Modified responses get the same Vary and ETag headers as the responses they
+    stand in for.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    app.after_request(keep_not_modified_headers)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+
+def keep_not_modified_headers(response: Response) -> Response:
+    """
+    This function is called after each request. It records the Content-Type and Content-Length
+    of a 304 Not Modified response, which are removed before it is sent, so the middleware can
+    tell whether the full response would have been compressed.
+
+    Args:
+        response (Response): The response to the request.
+
+    Returns:
+        Response: The same response.
+    """
+    if response.status_code == 304:
+        request.environ[NOT_MODIFIED_HEADERS] = [
+            (name, value) for name, value in response.headers
+            if name.lower() in ('content-type', 'content-length')
+        ]
+    return response
+
+
+class CompressionMiddleware:
+    """
+    A WSGI middleware that compresses HTML, JSON and other text responses with gzip or deflate,
+    whichever the client prefers in its Accept-Encoding header.
+
+    Responses are compressed as they are sent, chunk by chunk, so streamed responses (such as
+    the game history exports) are never held in memory. Each chunk of a streamed response is
+    flushed from the compressor as soon as it is compressed, so the client receives it straight
+    away. Responses that are already encoded (such as the precompressed static assets), partial
+    content, responses marked `no-transform` and responses smaller than `min_size` are sent as
+    they are.
+
+    Compressed responses have no Content-Length (the server sends them chunked) and a weak
+    ETag, since the compressed bytes differ from the ones the strong ETag describes. Every
+    compressible response gets `Vary: Accept-Encoding`, so shared caches keep both versions.
+    A 304 Not Modified response gets the same Vary and ETag headers as the response it stands
+    in for, using the headers recorded by `keep_not_modified_headers`.
+
+    Args:
+        app (Callable): The WSGI application, e.g. `app.wsgi_app`.
+        level (int, optional): The zlib compression level. Defaults to COMPRESSION_LEVEL.
+        min_size (int, optional): The smallest Content-Length compressed. Responses without a
+                                  Content-Length are always compressed. Defaults to COMPRESSION_MIN_SIZE.
+
+    Example:
+        >>> app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+        >>> app.after_request(keep_not_modified_headers)
+    """
+
+    def __init__(self, app: Callable, level: int = COMPRESSION_LEVEL, min_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        # Chooses the encoding from the client's Accept-Encoding header, if it accepts one.
+        encoding = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING')).best_match(list(ENCODINGS))
+        compressed = []
+
+        def compressing_start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            # Responses without a Content-Length are streamed.
+            streamed = all(name.lower() != 'content-length' for name, _ in headers)
+            headers, compress = self.prepare_headers(status, headers, encoding,
+                                                     environ.get(NOT_MODIFIED_HEADERS, []))
+            compressed[:] = [compress, streamed]
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, compressing_start_response)
+
+        # Compresses the body, except for HEAD requests, which have none.
+        if not compressed or not compressed[0] or environ.get('REQUEST_METHOD') == 'HEAD':
+            return app_iter
+        return CompressedBody(app_iter, zlib.compressobj(self.level, zlib.DEFLATED, ENCODINGS[encoding]),
+                              flush_chunks=compressed[1])
+
+    def prepare_headers(self, status: str, headers: List[Tuple[str, str]], encoding: Optional[str],
+                        not_modified_headers: List[Tuple[str, str]] = None) -> Tuple[List[Tuple[str, str]], bool]:
+        """
+        Decides whether a response is compressed and gets the headers to send with it.
+
+        Args:
+            status (str): The response status, e.g. "200 OK".
+            headers (List[Tuple[str, str]]): The response headers.
+            encoding (Optional[str]): The encoding the client accepts, or None.
+            not_modified_headers (List[Tuple[str, str]], optional): The Content-Type and
+                Content-Length of a 304 Not Modified response, recorded by `keep_not_modified_headers`.
+
+        Returns:
+            Tuple[List[Tuple[str, str]], bool]: The headers to send and whether the body is compressed.
+        """
+        status_code = int(status.split(' ', 1)[0])
+        values = {name.lower(): value for name, value in headers}
+
+        # Decides whether a 304 response's headers change from the headers of the full response.
+        if status_code == 304:
+            values = {**{name.lower(): value for name, value in not_modified_headers or []}, **values}
+        content_type = values.get('content-type', '').split(';', 1)[0].strip().lower()
+
+        # Sends responses that are not compressible text, or are already encoded, as they are.
+        if (content_type not in COMPRESSIBLE_TYPES or 'content-encoding' in values
+                or status_code < 200 or status_code in (204, 206)
+                or 'no-transform' in values.get('cache-control', '')):
+            return headers, False
+
+        # Tells caches the response depends on Accept-Encoding, whether or not it is compressed.
+        vary = values.get('vary')
+        if vary is None:
+            headers = headers + [('Vary', 'Accept-Encoding')]
+        elif vary.strip() != '*' and 'accept-encoding' not in vary.lower():
+            headers = [(name, f"{value}, Accept-Encoding" if name.lower() == 'vary' else value)
+                       for name, value in headers]
+
+        length = values.get('content-length')
+        if encoding is None or (length is not None and int(length) < self.min_size):
+            return headers, False
+
+        # The compressed length is not known until the body has been sent.
+        compressed_headers = []
+        for name, value in headers:
+            if name.lower() == 'content-length':
+                continue
+            if name.lower() == 'etag' and not value.startswith('W/'):
+                value = f"W/{value}"
+            compressed_headers.append((name, value))
+
+        # A 304 response has the compressed response's ETag, but no body to compress.
+        if status_code == 304:
+            return compressed_headers, False
+        compressed_headers.append(('Content-Encoding', encoding))
+        return compressed_headers, True
+
+
+class CompressedBody:
+    """
+    The compressed body of a response. Each chunk of the original body is compressed as it
+    is sent, and the original body is closed (ending the Flask request) when the server
+    closes this one.
+
+    Args:
+        app_iter (Iterable[bytes]): The original body.
+        compressor: The zlib compression object.
+        flush_chunks (bool, optional): If True, each chunk is flushed from the compressor as
+                                       soon as it is compressed, rather than when zlib's buffer
+                                       fills, so a streamed response is received as it is
+                                       generated. Defaults to False.
+    """
+
+    def __init__(self, app_iter: Iterable[bytes], compressor, flush_chunks: bool = False):
+        self.app_iter = app_iter
+        self.compressor = compressor
+        self.flush_chunks = flush_chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.app_iter:
+            data = self.compressor.compress(chunk)
+            if self.flush_chunks and chunk:
+                data += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield self.compressor.flush()
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
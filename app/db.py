@@ -1,18 +1,29 @@
+import logging
 import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 import os
 import datetime
+import functools
 import uuid
-from .hash import hash
-from typing import Dict, Union
-from dotenv import load_dotenv
+from .kdf import PasswordHasher, PasswordHasherBusy
+from . import migrations, statements
+from .pool import ConnectionPool
+from .statements import PreparingConnection
+from .write_behind import WriteBehindBuffer
+from .history_cache import HistoryCache
+from .cache import TTLCache
+from .metrics import QueryMetrics, name_statement
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from flask import Flask, Response, g, has_request_context, request
 
 
 # ======================
 # Database/SQL functions
 # ======================
 
-# Load the .env file
-load_dotenv()
+# Errors, slow queries and applied migrations are logged here.
+logger = logging.getLogger(__name__)
 
 # Gets the connection information of the database from the environment variables.
 DATABASE_NAME = os.getenv('DATABASE_NAME')
@@ -21,21 +32,369 @@ DATABASE_PASSWORD = os.getenv('DATABASE_PASSWORD')
 DATABASE_HOST = os.getenv('DATABASE_HOST')
 
 
-# # Establishes a connection to the database.
-# connection = psycopg2.connect(
-#     dbname=DATABASE_NAME,
-#     user=DATABASE_USER,
-#     password=DATABASE_PASSWORD,
-#     host=DATABASE_HOST
-# )
+# Gets the connection pool limits from the environment variables.
+DATABASE_POOL_MIN = int(os.getenv('DATABASE_POOL_MIN', 1))
+DATABASE_POOL_MAX = int(os.getenv('DATABASE_POOL_MAX', 4))
+DATABASE_POOL_TIMEOUT = float(os.getenv('DATABASE_POOL_TIMEOUT', 5))
+
+# Whether single-statement SQL scripts are prepared server-side on each connection.
+DATABASE_PREPARE_STATEMENTS = os.getenv('DATABASE_PREPARE_STATEMENTS', 'false').lower() == 'true'
+
+# Statements taking longer than this many seconds are logged as slow queries.
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 0.1))
+
+# The per-statement and per-request query counters, recorded by every cursor of the pool's connections.
+query_metrics = QueryMetrics(SLOW_QUERY_THRESHOLD)
+
+# The connection pool shared by every request in this process. The connections themselves
+# are only opened on the first checkout, so each gunicorn worker opens its own after forking.
+connection_pool = ConnectionPool(
+    DATABASE_POOL_MIN,
+    DATABASE_POOL_MAX,
+    DATABASE_POOL_TIMEOUT,
+    dbname=DATABASE_NAME,
+    user=DATABASE_USER,
+    password=DATABASE_PASSWORD,
+    host=DATABASE_HOST,
+    connection_factory=PreparingConnection,
+    cursor_factory=query_metrics.cursor_factory
+)
+
+# Whether game stats and wallet updates are buffered in memory and written in bulk, and the
+# time (in seconds) and size thresholds at which the buffer is flushed.
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', 'false').lower() == 'true'
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', 5))
+WRITE_BEHIND_FLUSH_SIZE = int(os.getenv('WRITE_BEHIND_FLUSH_SIZE', 500))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 10000))
+
+# The write-behind buffer, or None if updates are written immediately.
+write_buffer = WriteBehindBuffer(
+    connection_pool,
+    statements.get_statement,
+    WRITE_BEHIND_INTERVAL,
+    WRITE_BEHIND_FLUSH_SIZE,
+    WRITE_BEHIND_MAX_PENDING
+) if WRITE_BEHIND else None
+
+# The memory budget (in bytes, 0 disables the cache) and lifetime (in seconds) of the
+# in-process game history cache.
+HISTORY_CACHE_BYTES = int(os.getenv('HISTORY_CACHE_BYTES', 8 * 1024 * 1024))
+HISTORY_CACHE_TTL = float(os.getenv('HISTORY_CACHE_TTL', 60))
+
+# The game history cache used by the game history page.
+history_cache = HistoryCache(HISTORY_CACHE_BYTES, HISTORY_CACHE_TTL)
+
+# The number of games fetched from the server-side cursor at a time when exporting a game history.
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+# The maximum number of entries and lifetime (in seconds) of the in-process account and wallet
+# caches. Writes made by this process update the caches straight away; the lifetime bounds how
+# long a write made by another worker process can go unnoticed. 0 disables the caches.
+ACCOUNT_CACHE_SIZE = int(os.getenv('ACCOUNT_CACHE_SIZE', 10000))
+ACCOUNT_CACHE_TTL = float(os.getenv('ACCOUNT_CACHE_TTL', 30))
+
+# The user_id and sign_up_date of each username, which never change once an account is created.
+account_cache = TTLCache(ACCOUNT_CACHE_SIZE, ACCOUNT_CACHE_TTL)
+
+# The wallet of each user_id. The stakes tables read the wallet from the database instead,
+# since board.js sends a wallet based on it back after every hand.
+wallet_cache = TTLCache(ACCOUNT_CACHE_SIZE, ACCOUNT_CACHE_TTL)
+
+# The key derivation function and cost new password hashes use, and the size of the worker
+# pool (and its queue) that passwords are hashed on. PASSWORD_KDF_COST is the number of
+# PBKDF2 iterations, or scrypt's CPU/memory cost (a power of 2).
+PASSWORD_KDF = os.getenv('PASSWORD_KDF', 'pbkdf2-sha256')
+PASSWORD_KDF_COST = int(os.getenv('PASSWORD_KDF_COST', 600000 if PASSWORD_KDF == 'pbkdf2-sha256' else 32768))
+PASSWORD_KDF_WORKERS = int(os.getenv('PASSWORD_KDF_WORKERS', 2))
+PASSWORD_KDF_QUEUE = int(os.getenv('PASSWORD_KDF_QUEUE', 16))
+PASSWORD_KDF_TIMEOUT = float(os.getenv('PASSWORD_KDF_TIMEOUT', 10))
+
+# The password hasher used to register users and check their passwords.
+password_hasher = PasswordHasher(
+    PASSWORD_KDF,
+    PASSWORD_KDF_COST,
+    PASSWORD_KDF_WORKERS,
+    PASSWORD_KDF_QUEUE,
+    PASSWORD_KDF_TIMEOUT
+)
 
-# # Establishes a cursor to execute SQL queries.
-# cursor = connection.cursor()
+
+# ==========================
+# Connection pool functions
+# ==========================
+def get_connection():
+    """
+    Gets the database connection for the current request, checking one out of the pool
+    the first time it is needed. The connection is returned to the pool on teardown.
+
+    Every statement a request makes runs in a single transaction, which is committed once
+    when the request ends (see `commit_request`) and rolled back if it fails. GET and HEAD
+    requests use a read-only transaction that reads from one snapshot (REPEATABLE READ), so
+    the queries of a page agree with each other. Views decorated with `read_only` run each
+    statement on its own instead.
+
+    Returns:
+        connection: The psycopg2 connection for the current request.
+
+    Raises:
+        PoolTimeout: No connection became available within the pool's timeout.
+        psycopg2.Error: An error occurred when connecting to the database.
+
+    Example:
+        >>> connection = get_connection()
+    """
+    if 'db_connection' not in g:
+        connection = connection_pool.getconn()
+
+        # Neither setting sends anything to the database; they change how the next
+        # transaction is started.
+        if g.get('db_read_only'):
+            connection.autocommit = True
+        elif has_request_context() and request.method in ('GET', 'HEAD'):
+            connection.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+
+        # The wallet cache's generation before the transaction's first statement, which values
+        # read in the transaction are filled at (see `TTLCache.fill`).
+        g.db_wallet_generation = wallet_cache.generation
+        g.db_connection = connection
+    return g.db_connection
+
+
+def close_connection(exception: BaseException = None):
+    """
+    Returns the current request's connection to the pool. Any uncommitted work is rolled
+    back (and its `after_commit` callbacks dropped), and a connection that failed to roll
+    back is closed rather than reused.
+
+    Args:
+        exception (BaseException, optional): The exception that ended the request, if any.
+    """
+    g.pop('db_after_commit', None)
+    connection = g.pop('db_connection', None)
+    if connection is None:
+        return
+
+    broken = False
+    try:
+        if not connection.closed:
+            connection.rollback()
+
+            # Restores the pool's default transaction settings.
+            connection.autocommit = False
+            connection.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+    except psycopg2.Error:
+        broken = True
+    connection_pool.putconn(connection, close=broken)
+
+
+def commit():
+    """
+    Commits the current request's transaction, if it has one, then runs the callbacks
+    registered with `after_commit`. Requests are committed by `commit_request`; this is
+    called directly by code that uses the database outside a request, e.g. in a script.
+
+    Raises:
+        psycopg2.Error: An error occurred when committing the transaction.
+
+    Example:
+        >>> with app.app_context():
+        ...     add_user("username", "password")
+        ...     commit()
+    """
+    connection = g.get('db_connection')
+    if connection is not None and not connection.autocommit:
+        try:
+            connection.commit()
+        except psycopg2.Error as e:
+            logger.error("An error occurred committing changes to the database: %s", e)
+            raise
+
+    # Runs the callbacks in the order they were registered.
+    for callback, args in g.pop('db_after_commit', []):
+        callback(*args)
+
+
+def release_connection():
+    """
+    Commits the current request's transaction and returns its connection to the pool before
+    the request ends, so slow work that does not need the database (such as hashing a
+    password) does not hold a pooled connection. The next call to `get_connection` checks a
+    connection out again, in a new transaction.
+
+    Raises:
+        psycopg2.Error: An error occurred when committing the transaction.
+
+    Example:
+        >>> execute_script(cursor, "accounts/authenticate.sql", (username,))
+        >>> row = cursor.fetchone()
+        >>> release_connection()
+    """
+    commit()
+    close_connection()
+
+
+def after_commit(callback: Callable, *args):
+    """
+    Registers a function to be called once the current request's transaction has been
+    committed, e.g. to update a cache with a value that has just been written. The
+    function is not called if the transaction is rolled back.
+
+    Args:
+        callback (Callable): The function to call.
+        *args: The arguments to call it with.
+
+    Example:
+        >>> after_commit(wallet_cache.set, 1, 120)
+    """
+    g.setdefault('db_after_commit', []).append((callback, args))
+
+
+def commit_request(response: Response) -> Response:
+    """
+    This function is called after each request. It commits the request's transaction unless
+    the request failed. Streamed responses are not committed here, since they are still using
+    the transaction; they must only read, and their transaction is rolled back on teardown.
+
+    Args:
+        response (Response): The response to the request.
+
+    Returns:
+        Response: The same response.
+    """
+    if response.status_code < 500 and not response.is_streamed:
+        commit()
+    return response
+
+
+def read_only(view: Callable) -> Callable:
+    """
+    Decorates a view that only reads from the database, so its connection runs in autocommit
+    mode: each statement is its own transaction and no BEGIN or COMMIT is sent, which saves
+    two round trips on pages that make one or two queries. The statements do not share a
+    snapshot, and anything the view writes would be committed straight away.
+
+    Args:
+        view (Callable): The view function.
+
+    Returns:
+        Callable: The decorated view function.
+
+    Example:
+        >>> @blackjack_views.route('/menu/account')
+        ... @read_only
+        ... def account():
+        ...     ...
+    """
+    @functools.wraps(view)
+    def decorated_view(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+def init_process():
+    """
+    Creates this process's connection pool, write-behind flush thread and password hashing
+    pool. Each of these belongs to a single process, so they are created in every gunicorn
+    worker after it forks (by the `post_fork` hook in gunicorn.conf.py) rather than in the
+    master. They are otherwise created on first use, so a worker that cannot reach the
+    database still starts, and opens the pool on its first request.
+    """
+    try:
+        connection_pool.open()
+    except psycopg2.Error as e:
+        logger.warning("Could not open the connection pool, it will be opened on first use: %s", e)
+
+    if write_buffer is not None:
+        write_buffer.start()
+    password_hasher.start()
+
+
+def close_process():
+    """
+    Writes any game stats and wallets waiting in the write-behind buffer as the process exits.
+    gunicorn workers call this from the `worker_exit` hook in gunicorn.conf.py, since a worker
+    does not always run `atexit` handlers when it exits.
+    """
+    if write_buffer is not None:
+        write_buffer.close()
+
+
+def get_pool_stats() -> Dict[str, Union[int, float]]:
+    """
+    Gets the connection pool's size, checkout and wait-time counters for this process.
+
+    Returns:
+        Dict[str, Union[int, float]]: The counters described in `ConnectionPool.stats`.
+
+    Example:
+        >>> get_pool_stats()["checkouts"]
+        12
+    """
+    return connection_pool.stats()
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Union[int, float]]]:
+    """
+    Gets the hit, miss and size counters of each in-process cache.
+
+    Returns:
+        Dict[str, Dict[str, Union[int, float]]]: The counters of the "accounts", "wallets" and
+                                                 "history" caches.
+
+    Example:
+        >>> get_cache_stats()["wallets"]["hits"]
+        40
+    """
+    return {
+        "accounts": account_cache.stats(),
+        "wallets": wallet_cache.stats(),
+        "history": history_cache.stats(),
+    }
+
+
+def init_app(app: Flask):
+    """
+    Loads the SQL statement registry and registers the per-request commit, the database
+    teardown and the per-request query counters with the Flask application.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    statements.load_statements()
+    app.after_request(commit_request)
+    app.teardown_request(record_request_metrics)
+    app.teardown_appcontext(close_connection)
+
+
+def record_request_metrics(exception: BaseException = None):
+    """
+    Records the number of queries made by the request that has just ended.
+
+    Args:
+        exception (BaseException, optional): The exception that ended the request, if any.
+    """
+    query_metrics.record_request()
+
+
+def get_query_stats() -> Dict[str, Dict]:
+    """
+    Gets the per-statement and per-request query counters for this process.
+
+    Returns:
+        Dict[str, Dict]: The counters described in `QueryMetrics.stats`.
+
+    Example:
+        >>> get_query_stats()["statements"]["wallets/get-wallet.sql"]["count"]
+        3
+    """
+    return query_metrics.stats()
 
 
 def get_sql_script(filename: str) -> str:
     """
-    Gets and returns the SQL script for the given file.
+    Gets and returns the SQL script for the given file from the statement registry,
+    which reads every script under app/sql/ once rather than on every query.
 
     Args:
         filename (str): Name of the file containing the SQL script.
@@ -47,23 +406,39 @@ def get_sql_script(filename: str) -> str:
         >>> sql_script = get_sql_script("example.sql")
         SELECT * FROM example_table WHERE condition = 'example';
     """
-    # Get the directory path of the current file.
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return statements.get_statement(filename)
+
 
-    # Navigates to the SQL folder and selects the file.
-    sql_file_path = os.path.join(current_dir, f'sql/{filename}')
+def execute_script(cursor, filename: str, params=None, **fields: sql.Composable):
+    """
+    Executes the SQL script for the given file. When DATABASE_PREPARE_STATEMENTS is enabled,
+    single-statement scripts are prepared on each connection the first time they are used
+    and executed with EXECUTE afterwards, so the server does not re-parse them. The statement
+    is recorded in `query_metrics` under the file name.
 
-    # Opens, reads and stores the SQL script.
-    with open(sql_file_path, 'r') as sql_file:
-        sql_script = sql_file.read()
+    Args:
+        cursor: The psycopg2 cursor to execute the SQL script with.
+        filename (str): Name of the file containing the SQL script.
+        params (optional): The parameters to pass to the SQL script.
+        **fields (sql.Composable): SQL fragments filling the script's `{name}` fields, for parts
+                                   of a script (such as ORDER BY columns) that cannot be parameters.
 
-    # Return the SQL script.
-    return sql_script
+    Example:
+        >>> execute_script(cursor, "wallets/get-wallet.sql", (1,))
+    """
+    name_statement(cursor, filename)
+    if fields:
+        cursor.execute(sql.SQL(get_sql_script(filename)).format(**fields), params)
+        return
+    if DATABASE_PREPARE_STATEMENTS and statements.execute_prepared(cursor, filename, params):
+        return
+    cursor.execute(get_sql_script(filename), params)
 
 
 def create_tables():
     """
-    Gets and executes the SQL script to create the database tables.
+    Creates the database tables, or brings existing tables up to date, by applying any
+    migrations in app/sql/migrations/ that have not been applied yet. Existing data is kept.
 
     Raises:
         psycopg2.Error: An error occurred when connecting to the database, 
@@ -71,110 +446,109 @@ def create_tables():
         Exception: An unexpected error occurred.
 
     Example:
-        >>> createTables()
+        >>> create_tables()
     """
-    # Attempts to get and execute the SQL script to create the tables in the database.
+    # Attempts to apply the migrations to the database.
     try:
-        # Gets and executes the SQL script to create the tables in the database.
-        sql_script = get_sql_script("general/schema.sql")
-        cursor.execute(sql_script)
+        # Gets the connection for the current request.
+        connection = get_connection()
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Applies the pending migrations, each in its own transaction.
+        applied = migrations.migrate(connection)
+        if applied:
+            logger.info("Applied database migrations: %s", ", ".join(str(version) for version in applied))
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
 
 # ==========================
 # 'accounts' table functions
 # ==========================
-def add_user(username: str, password: str) -> bool:
+def add_user(username: str, password: str) -> Optional[Dict[str, Union[int, str]]]:
     """
-    Gets and executes the SQL script to add a user to the database tables.
+    Gets and executes the SQL script to add a user and their wallet to the database tables.
+
+    The account and wallet are created by a single statement, which relies on the UNIQUE
+    constraint on usernames, so two people signing up with the same username at once cannot
+    both succeed.
 
     Args:
         username (str): The username of the user to be added to the database.
         password (str): The password of the user to be added to the database.
 
     Returns:
-        bool: True if the user was successfully registered in the database, False otherwise.
+        Optional[Dict[str, Union[int, str]]]: None if the username is already registered,
+            otherwise a dictionary containing the following keys:
+            - "wallet" (int): The user's wallet balance.
+            - "sign_up_date" (str): The user's sign-up date in the format 'dd-mm-yyyy'.
+            - "user_id" (int): The user's ID in the database.
 
     Raises:
         psycopg2.Error: An error occurred when connecting to the database, 
                         executing SQL commands or committing changes to the database.
+        PasswordHasherBusy: Too many passwords are being hashed to hash this one right now.
         Exception: An unexpected error occurred.
 
     Example:
         >>> add_user("username", "password")
-        True
+        {
+            "wallet": 100,
+            "sign_up_date": 01-01-2000,
+            "user_id": 1
+        }
     """
-    # Sets whether the user has been added to the database to false.
-    registered = False
-
-    # Attempts to get and execute the SQL scripts to add a user to the 'accounts'
+    # Attempts to get and execute the SQL script to add a user to the 'accounts'
     # table and register a wallet in the 'wallets' table.
     try:
-        # Gets and executes the SQL script to check if the username is already
-        # registered in the database.
-        sql_script = get_sql_script("accounts/validate-username.sql")
-        cursor.execute(sql_script, (username,))
-
-        # Stores the amount of times a given username appears in the database.
-        user_count = cursor.fetchone()
+        # Hashes the password with a new salt before checking out a connection, so the
+        # connection is not held while the password is hashed.
+        salt = uuid.uuid4().hex
+        password_hash = password_hasher.hash(password, salt)
 
-        # If the username appears more than 0 times in the database,
-        # then the user exists.
-        username_taken = user_count[0] > 0
-
-        # If the username is not taken, add the user to the database and
-        # creates a wallet for that user.
-        if not username_taken:
-            salt = uuid.uuid4().hex
-            # Gets and executes the SQL script to add a user to the database.
-            sql_account_script = get_sql_script(
-                "accounts/register-account.sql")
-            cursor.execute(sql_account_script,
-                           (username, hash(password, salt), salt))
-
-            # Gets the user_id to use in creating a wallet for that user.
-            sql_user_id_script = get_sql_script(
-                "accounts/get-account-information.sql")
-            cursor.execute(sql_user_id_script, (username,))
-            user_id = cursor.fetchone()[0]
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
 
-            # Gets and executes the SQL script to create a wallet for the user.
-            sql_create_wallet_script = get_sql_script(
-                "wallets/create-wallet.sql")
-            cursor.execute(sql_create_wallet_script, (user_id,))
+        # Gets and executes the SQL script to add the user and their wallet to the database.
+        execute_script(cursor, "accounts/register-account.sql", (username, password_hash, salt))
+        row = cursor.fetchone()
 
-            # Defines a boolean stating the user has been registered in the database.
-            registered = True
+        # Stores the account information, or None if the username is already registered.
+        account_information = None
+        if row is not None:
+            account_information = {
+                "wallet": row[2],
+                "sign_up_date": row[1].strftime('%d-%m-%Y'),
+                "user_id": row[0]
+            }
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Caches the new account once it is committed, since the user is logged straight in.
+        if row is not None:
+            after_commit(account_cache.set, username, (row[0], row[1]))
+            after_commit(wallet_cache.set, row[0], row[2])
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database or executing SQL: ", e)
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
-    # Returns whether the user has been added to the database.
-    return registered
+    # Returns the account information of the new user.
+    return account_information
 
 
 def validate_username(username: str) -> bool:
@@ -199,10 +573,13 @@ def validate_username(username: str) -> bool:
     # Attempts to get and execute the SQL script to check if the given username
     # appears in the database.
     try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
         # Gets and executes the SQL script to check how many times a username
         # appears in the database.
-        sql_script = get_sql_script("accounts/validate-username.sql")
-        cursor.execute(sql_script, (username,))
+        execute_script(cursor, "accounts/validate-username.sql", (username,))
 
         # Stores how many times a username appears in the database
         user_count = cursor.fetchone()
@@ -211,18 +588,15 @@ def validate_username(username: str) -> bool:
         # then the user exists.
         user_exists = user_count[0] > 0
 
-        # Commits the changes to the database.
-        connection.commit()
-
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database or executing SQL: ", e)
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns whether the user exists.
@@ -243,51 +617,127 @@ def validate_password(username: str, password: str) -> bool:
     Raises:
         psycopg2.Error: An error occurred when connecting to the database, 
                         executing SQL commands or committing changes to the database.
+        PasswordHasherBusy: Too many passwords are being hashed to hash this one right now.
         Exception: An unexpected error occurred.
 
     Example:
         >>> validate_password("username", "password")
         True
     """
-    # Attempts to get and execute the SQL script to check if the hash of the given password
-    # matches the hash of the password in the database.
+    # Checks the password with the same query used to log in.
+    account = authenticate(username, password)
+
+    # Returns whether the user exists and the password is correct.
+    return account is not None and account["password_correct"]
+
+
+def authenticate(username: str, password: str) -> Optional[Dict[str, Union[bool, int, str]]]:
+    """
+    Checks the given username and password and gets the account information, including the
+    wallet, with a single query. The request's transaction is committed and its connection
+    returned to the pool before the password is checked (see `release_connection`).
+
+    Args:
+        username (str): The username of the user logging in.
+        password (str): The password to be validated.
+
+    Returns:
+        Optional[Dict[str, Union[bool, int, str]]]: None if the username is not registered,
+            otherwise a dictionary containing the following keys:
+            - "password_correct" (bool): Whether the password is correct.
+            - "wallet" (int): The user's wallet balance.
+            - "sign_up_date" (str): The user's sign-up date in the format 'dd-mm-yyyy'.
+            - "user_id" (int): The user's ID in the database.
+
+    Raises:
+        psycopg2.Error: An error occurred when connecting to the database, 
+                        executing SQL commands or committing changes to the database.
+        PasswordHasherBusy: Too many passwords are being hashed to hash this one right now.
+        Exception: An unexpected error occurred.
+
+    Example:
+        >>> authenticate("username", "password")
+        {
+            "password_correct": True,
+            "wallet": 100,
+            "sign_up_date": 01-01-2000,
+            "user_id": 1
+        }
+    """
+    # Attempts to get and execute the SQL script to get the password hash and the account
+    # information for the given username.
     try:
-        # Gets and executes the SQL script to get the stored password for the given username.
-        sql_script = get_sql_script("accounts/validate-password.sql")
-        cursor.execute(sql_script, (username,))
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
+        # Gets and executes the SQL script to get the password hash, salt, user_id,
+        # sign_up_date and wallet for the given username.
+        execute_script(cursor, "accounts/authenticate.sql", (username,))
+        row = cursor.fetchone()
 
-        # Gets the password hash and salt from the database for the given username.
-        results = cursor.fetchone()
-        stored_password = results[0]
-        stored_salt = results[1]
+        # The wallet cache's generation the wallet was read at, kept since checking a connection
+        # out again for a password upgrade starts a new transaction at a later generation.
+        wallet_generation = g.db_wallet_generation
 
-        # Updates the password to be the hash of the given password.
-        password = hash(password, stored_salt)
+        # Returns the connection to the pool before the password is checked, which can take
+        # hundreds of milliseconds, so a burst of logins does not use up the pool.
+        release_connection()
+
+        # Returns None if the username is not registered.
+        if row is None:
+            return None
+        stored_password, stored_salt, user_id, sign_up_date, wallet = row
 
         # Checks if the hash of the given password matches the hash of the password in the database.
-        correct_password = stored_password == password
+        correct_password = password_hasher.verify(password, stored_salt, stored_password)
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Rehashes the password with a new salt if it was hashed with a legacy hash or older
+        # settings, checking a connection out again only once the new hash is ready.
+        if correct_password and password_hasher.needs_upgrade(stored_password):
+            salt = uuid.uuid4().hex
+            password_hash = password_hasher.hash(password, salt)
+            execute_script(get_connection().cursor(), "accounts/update-password.sql",
+                           (password_hash, salt, username))
+
+        # Caches the account, which the pages shown after logging in read straight away.
+        if correct_password:
+            account_cache.set(username, (user_id, sign_up_date))
+            wallet_cache.fill(user_id, wallet, wallet_generation)
+
+        # Uses the wallet waiting in the write-behind buffer, if there is one, since it is
+        # newer than the wallet in the database.
+        if write_buffer is not None:
+            pending_wallet = write_buffer.pending_wallet(user_id)
+            wallet = pending_wallet if pending_wallet is not None else wallet
+
+        # Stores the result of the check and the account information in a dictionary.
+        account = {
+            "password_correct": correct_password,
+            "wallet": wallet,
+            "sign_up_date": sign_up_date.strftime('%d-%m-%Y'),
+            "user_id": user_id
+        }
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database or executing SQL: ", e)
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
-    # Returns whether the password is correct.
-    return correct_password
+    # Returns the result of the check and the account information.
+    return account
 
 
 def get_account_information(username: str) -> Dict[str, Union[int, str]]:
     """
     Gets and executes the SQL script to get the account information for the given username.
+    The account and wallet are read from the in-process caches when both are cached.
 
     Args:
         username (str): The username of the account for which the account information is to be retrieved.
@@ -311,41 +761,55 @@ def get_account_information(username: str) -> Dict[str, Union[int, str]]:
             "user_id": 1
         }
     """
+    # Uses the cached account information if both the account and its wallet are cached.
+    account = account_cache.lookup(username)
+    wallet = None
+    if account is not None:
+        user_id = account[0]
+        if write_buffer is not None:
+            wallet = write_buffer.pending_wallet(user_id)
+        if wallet is None:
+            wallet = wallet_cache.lookup(user_id)
+
     # Attempts to get and execute the SQL script to get the user information from the database.
     try:
-        # Gets and executes the SQL script to get the 'user_id' and 'sign_up_date'.
-        sql_get_sign_up_date_script = get_sql_script(
-            "accounts/get-account-information.sql")
-        cursor.execute(sql_get_sign_up_date_script, (username,))
-        row = cursor.fetchone()
-
-        # Stores the 'user_id' and 'sign_up_date' for the given account in variables.
-        user_id, sign_up_date = row[0], row[1]
-
-        # Gets and executes the SQL script to get the wallet value for the given username.
-        sql_wallet_script = get_sql_script("wallets/get-wallet.sql")
-        cursor.execute(sql_wallet_script, (user_id,))
-        wallet = cursor.fetchone()[0]
+        if account is None or wallet is None:
+            # Gets the connection and a cursor for the current request.
+            connection = get_connection()
+            cursor = connection.cursor()
+
+            # Gets and executes the SQL script to get the 'user_id', 'sign_up_date' and 'wallet'.
+            execute_script(cursor, "accounts/get-account-information.sql", (username,))
+            row = cursor.fetchone()
+
+            # Caches the account, which never changes, and its wallet.
+            account = (row[0], row[1])
+            account_cache.set(username, account)
+            wallet_cache.fill(row[0], row[2], g.db_wallet_generation)
+
+            # Uses the wallet waiting in the write-behind buffer, if there is one, since it is
+            # newer than the wallet in the database.
+            wallet = write_buffer.pending_wallet(row[0]) if write_buffer is not None else None
+            if wallet is None:
+                wallet = row[2]
 
         # Stores the wallet and sign-up date in a dictionary.
+        user_id, sign_up_date = account
         account_information = {
             "wallet": wallet,
             "sign_up_date": sign_up_date.strftime('%d-%m-%Y'),
             "user_id": user_id
         }
 
-        # Commits the changes to the database.
-        connection.commit()
-
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database or executing SQL: ", e)
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns a dictionary with the account information.
@@ -355,6 +819,20 @@ def get_account_information(username: str) -> Dict[str, Union[int, str]]:
 # =======================
 # 'games' table functions
 # =======================
+
+# The SQL expressions the games can be sorted by, keyed by the column names used in the game
+# history's sort types (e.g. "descending_net_profit_loss"). Tables are ordered by their stakes.
+GAME_SORT_KEYS = {
+    "date": sql.SQL("g.date_of_game"),
+    "time": sql.SQL("g.time_of_game"),
+    "num_of_hands": sql.SQL("gs.number_of_hands"),
+    "net_profit_loss": sql.SQL("gs.net_profit_loss"),
+    "average_profit_loss": sql.SQL("gs.average_profit_loss"),
+    "game_stakes": sql.SQL(
+        "CASE g.game_table WHEN 'Low' THEN 0 WHEN 'Medium' THEN 1 WHEN 'High' THEN 2 ELSE 3 END"),
+}
+
+
 def create_game(user_id: int, game_table: str):
     """
     Gets and executes the SQL script to create a game in the database table 'games'.
@@ -373,26 +851,26 @@ def create_game(user_id: int, game_table: str):
     """
     # Attempts to get and execute the SQL script to create a game in the database.
     try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
         # Gets and executes the SQL script to create a game in the database.
-        sql_script = get_sql_script("games/create-game.sql")
-        cursor.execute(sql_script, (user_id, game_table))
+        execute_script(cursor, "games/create-game.sql", (user_id, game_table))
 
         # Fetches the game_id of the last inserted game
         cursor.execute("SELECT lastval();")
         game_id = cursor.fetchone()[0]
 
-        # Commits the changes to the database.
-        connection.commit()
-
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database or executing SQL: ", e)
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns the `game_id` of the most recently created game.
@@ -430,10 +908,13 @@ def get_game_information(game_id: int) -> Dict[str, Union[int, datetime.date, da
     # Attempts to get and execute the SQL script to get the game information for the given
     # 'game_id' from the database.
     try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
         # Gets and executes the SQL script to get the game information for the given
         # 'game_id' from the database
-        sql_script = get_sql_script("games/get-game-information.sql")
-        cursor.execute(sql_script, (game_id,))
+        execute_script(cursor, "games/get-game-information.sql", (game_id,))
 
         # Gets and stores the game information in a dictionary.
         information = cursor.fetchone()
@@ -444,30 +925,27 @@ def get_game_information(game_id: int) -> Dict[str, Union[int, datetime.date, da
             "game_table": information[3]
         }
 
-        # Commits the changes to the database.
-        connection.commit()
-
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns the game information.
     return game_information
 
 
-def get_all_games(user_id) -> list[list]:
+def get_all_games(user_id: int) -> list[list]:
     """
-    Gets and executes the SQL script to get the game data in the database.
+    Gets and executes the SQL script to get every game the given user has played, ordered by date.
 
     Args:
-        user_id (int): The game_id of the requested game.
+        user_id (int): The user_id of the user whose games are requested.
 
     Returns:
         list[list]: A list of lists containing game information. Each inner list represents a game record
@@ -479,37 +957,208 @@ def get_all_games(user_id) -> list[list]:
         Exception: An unexpected error occurred.
 
     Example:
-        >>> get_game_information(1)
+        >>> get_all_games(1)
+        [[datetime.date(2024, 3, 17), datetime.time(14, 13, 58), 5, 220, 44, "Low"], ...]
+    """
+    # Gets every game in a single page.
+    games, _ = get_games_page(user_id)
+
+    # Returns the game information.
+    return games
+
+
+def get_games_page(user_id: int, sort_column: str = "date", descending: bool = False,
+                   seek: Optional[str] = None, key: Optional[list] = None,
+                   limit: Optional[int] = None) -> Tuple[list[list], list[list]]:
     """
-    # Attempts to get and execute the SQL script to get the game information for all games from the database.
+    Gets and executes the SQL script to get a page of the given user's games, sorted and
+    paginated by the database. Pages are found by seeking from the key of a row on the
+    neighbouring page, so the cost of a page does not depend on how many games come before it.
+
+    Args:
+        user_id (int): The user_id of the user whose games are requested.
+        sort_column (str, optional): The column to sort by, one of the keys of `GAME_SORT_KEYS`.
+                                     Defaults to "date".
+        descending (bool, optional): If True, sort in descending order. Defaults to False.
+        seek (Optional[str], optional): Where the page starts relative to `key`: "after" (the
+                                        page following the row), "from" (the page starting at
+                                        the row) or "before" (the page preceding the row).
+                                        Defaults to None, which starts from the first game.
+        key (Optional[list], optional): The key of the row to seek from, as returned by this function.
+        limit (Optional[int], optional): The number of games in the page. Defaults to None, which
+                                         returns every remaining game.
+
+    Returns:
+        Tuple[list[list], list[list]]: The games in the page (in the same form as `get_all_games`)
+                                       and the key of each game, which can be stored in the session.
+
+    Raises:
+        KeyError: `sort_column` is not a column the games can be sorted by.
+        psycopg2.Error: An error occurred when connecting to the database, 
+                        executing SQL commands or committing changes to the database.
+        Exception: An unexpected error occurred.
+
+    Example:
+        >>> get_games_page(1, "net_profit_loss", True, "after", [220, 4], 7)
+        ([[datetime.date(2024, 3, 15), datetime.time(17, 18), 6, 200, 33, "Medium"], ...],
+         [[200, 2], ...])
+    """
+    # Looks the sort key up in the whitelist, since it is placed in the SQL script itself.
+    sort_key = GAME_SORT_KEYS[sort_column]
+
+    # The page before a row is found by reading backwards from it and reversing the result.
+    backwards = seek == "before"
+    ascending = descending == backwards
+    direction = sql.SQL("ASC" if ascending else "DESC")
+
+    # Builds the seek condition, comparing (sort key, game_id) with the given row's key. The
+    # comparison follows the direction the rows are read in.
+    params = [user_id]
+    if seek is None:
+        seek_condition = sql.SQL("TRUE")
+    else:
+        operator = {"after": ">", "from": ">=", "before": ">"}[seek] if ascending else \
+            {"after": "<", "from": "<=", "before": "<"}[seek]
+        seek_condition = sql.SQL("({}, g.game_id) {} (%s, %s)").format(sort_key, sql.SQL(operator))
+        params.extend(key)
+    params.append(limit)
+
+    # Attempts to get and execute the SQL script to get the page of games from the database.
     try:
-        # Gets and executes the SQL script to get the game information for the given
-        # 'game_id' from the database by joining the `game_id` from the game_stats and games tables.
-        sql_script = get_sql_script("games/get-all-games.sql")
-        cursor.execute(sql_script, (user_id,))
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
+        # Gets and executes the SQL script to get the page of games by joining the `game_id`
+        # from the game_stats and games tables.
+        execute_script(cursor, "games/get-all-games.sql", params,
+                       sort_key=sort_key, seek=seek_condition, direction=direction)
+        rows = cursor.fetchall()
+
+    # Catches any errors connecting to the database, executing SQL or committing
+    # changes to the database.
+    except psycopg2.Error as e:
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
+        raise
+
+    # Catches any other errors.
+    except Exception as e:
+        logger.error("An error occurred: %s", e)
+        raise
+
+    # Puts the rows of a page read backwards back into order.
+    if backwards:
+        rows.reverse()
+
+    # Splits each row into the game information and its key. Dates and times in the keys
+    # are stored as ISO strings, which PostgreSQL compares with the original columns.
+    games = [list(row[:6]) for row in rows]
+    keys = [[row[6].isoformat() if isinstance(row[6], (datetime.date, datetime.time)) else row[6], row[7]]
+            for row in rows]
+
+    # Returns the game information and keys.
+    return games, keys
+
+
+def stream_games(user_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """
+    Gets and executes the SQL script to get every game the given user has played, yielding
+    the games in batches from a server-side cursor so only one batch is held in memory.
+
+    The cursor belongs to the current request's connection and transaction, so the generator
+    must be consumed before the request ends (e.g. with `stream_with_context`).
+
+    Args:
+        user_id (int): The user_id of the user whose games are exported.
+        batch_size (int, optional): The number of games fetched at a time. Defaults to EXPORT_BATCH_SIZE.
+
+    Yields:
+        List[tuple]: Batches of games, each a tuple of the date, time, number of hands,
+                     net profit/loss, average profit/loss and game table, in the order played.
+
+    Raises:
+        psycopg2.Error: An error occurred when connecting to the database or executing SQL commands.
+        Exception: An unexpected error occurred.
+
+    Example:
+        >>> next(stream_games(1))
+        [(datetime.date(2024, 3, 17), datetime.time(20, 8), 3, 400, 133, 'Medium'), ...]
+    """
+    # Attempts to get and execute the SQL script to get the games from the database.
+    try:
+        # Gets the connection for the current request and a named (server-side) cursor, which
+        # keeps the results in the database until they are fetched.
+        connection = get_connection()
+        cursor = connection.cursor(name=f"export_games_{uuid.uuid4().hex}")
+
+        # Gets and executes the SQL script. A named cursor declares its own query, so the
+        # script is not prepared even if DATABASE_PREPARE_STATEMENTS is enabled.
+        name_statement(cursor, "games/export-games.sql")
+        cursor.execute(get_sql_script("games/export-games.sql"), (user_id,))
+
+        # Yields the games one batch at a time.
+        while True:
+            games = cursor.fetchmany(batch_size)
+            if not games:
+                break
+            yield games
+
+        # Closes the server-side cursor. The request's transaction is rolled back on teardown.
+        cursor.close()
+
+    # Catches any errors connecting to the database or executing SQL.
+    except psycopg2.Error as e:
+        logger.error("An error occurred connecting to the database or executing SQL: %s", e)
+        raise
+
+    # Catches any other errors.
+    except Exception as e:
+        logger.error("An error occurred: %s", e)
+        raise
 
-        # Gets and stores the game information in a dictionary.
-        games = cursor.fetchall()
 
-        # Converts all the tuples to a two-dimensional list
-        games = [list(row) for row in games]
+def count_games(user_id: int) -> int:
+    """
+    Gets and executes the SQL script to count the games the given user has played.
+
+    Args:
+        user_id (int): The user_id of the user whose games are counted.
 
-        # Commits the changes to the database.
-        connection.commit()
+    Returns:
+        int: The number of games the user has played.
+
+    Raises:
+        psycopg2.Error: An error occurred when connecting to the database, 
+                        executing SQL commands or committing changes to the database.
+        Exception: An unexpected error occurred.
+
+    Example:
+        >>> count_games(1)
+        23
+    """
+    # Attempts to get and execute the SQL script to count the user's games.
+    try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
+        # Gets and executes the SQL script to count the user's games.
+        execute_script(cursor, "games/count-games.sql", (user_id,))
+        number_of_games = cursor.fetchone()[0]
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
-    # Returns the game information.
-    return games
+    # Returns the number of games.
+    return number_of_games
 
 
 # ============================
@@ -533,22 +1182,22 @@ def add_game_stats(game_id: int):
     # Attempts to get and execute the SQL script to add the game stats for the given 'game_id'
     # to the database.
     try:
-        # Gets and executes the SQL script to add the game stats to the database.
-        sql_script = get_sql_script("game_stats/add-game-stats.sql")
-        cursor.execute(sql_script, (game_id,))
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Gets and executes the SQL script to add the game stats to the database.
+        execute_script(cursor, "game_stats/add-game-stats.sql", (game_id,))
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
 
@@ -571,23 +1220,23 @@ def update_game_stats(game_id: int, net_profit_loss: int, average_profit_loss: i
     """
     # Attempts to get and execute the SQL script to update the game stats for the given 'game_id'.
     try:
-        # Gets and executes the SQL script to update the game stats for the given 'game_id'.
-        sql_script = get_sql_script("game_stats/update-game-stats.sql")
-        cursor.execute(sql_script, (net_profit_loss,
-                       average_profit_loss, game_id))
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Gets and executes the SQL script to update the game stats for the given 'game_id'.
+        execute_script(cursor, "game_stats/update-game-stats.sql",
+                       (net_profit_loss, average_profit_loss, game_id))
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
 
@@ -619,9 +1268,12 @@ def get_game_stats(game_id: int) -> Dict:
     """
     # Attempts to get and execute the SQL script to get the game stats from the database.
     try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
         # Gets and executes the SQL script to get the game stats from the database.
-        sql_script = get_sql_script("game_stats/get-game-stats.sql")
-        cursor.execute(sql_script, (game_id,))
+        execute_script(cursor, "game_stats/get-game-stats.sql", (game_id,))
 
         # Gets and stores the game information in a dictionary.
         stats = cursor.fetchone()
@@ -631,34 +1283,205 @@ def get_game_stats(game_id: int) -> Dict:
             "average_profit_loss": stats[2],
         }
 
-        # Commits the changes to the database.
-        connection.commit()
-
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns the game stats.
     return game_stats
 
 
+def record_hand(user_id: int, game_id: Optional[int], game_table: str,
+                profit_loss: int, wallet: int) -> Optional[Dict[str, int]]:
+    """
+    Records a hand in a single statement. If `game_id` is None a new game is
+    created, otherwise the hand is added to the stats of the given game. The user's wallet is
+    set to the given value in the same statement.
+
+    Args:
+        user_id (int): The user_id of the user who played the hand.
+        game_id (Optional[int]): The game_id of the game being played, or None to start a new game.
+        game_table (str): The table that the game is being played on.
+        profit_loss (int): The profit/loss of the hand.
+        wallet (int): The user's new wallet value.
+
+    Returns:
+        Optional[Dict[str, int]]: A dictionary containing the following keys, or None if the
+                                  given game does not exist or belongs to another user, in
+                                  which case nothing is written:
+            - "game_id" (int): The game_id of the game the hand was recorded in.
+            - "number_of_hands" (int): The number of hands played in this game.
+            - "net_profit_loss" (int): The net profit/loss of the player in this game.
+            - "average_profit_loss" (int): The average profit/loss per hand of the player in this game.
+            - "wallet" (Optional[int]): The user's wallet value, or None if the user has no wallet.
+
+    Raises:
+        psycopg2.Error: An error occurred when connecting to the database,
+                        executing SQL commands or committing changes to the database.
+        Exception: An unexpected error occurred.
+
+    Example:
+        >>> record_hand(1, None, "Low", 20, 120)
+        {
+            "game_id": 3,
+            "number_of_hands": 1,
+            "net_profit_loss": 20,
+            "average_profit_loss": 20,
+            "wallet": 120
+        }
+    """
+    # Attempts to get and execute the SQL script to record the hand.
+    try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
+        # Removes the cached wallet until the new wallet is committed.
+        wallet_cache.invalidate(user_id)
+
+        # Gets and executes the SQL script to update the game stats and wallet.
+        execute_script(cursor, "game_stats/record-hand.sql", {
+            "user_id": user_id,
+            "game_id": game_id,
+            "game_table": game_table,
+            "profit_loss": profit_loss,
+            "wallet": wallet
+        })
+
+        # Returns None if the game does not exist or belongs to another user, in which case
+        # nothing was written.
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        # Stores the new game stats and wallet in a dictionary.
+        hand = {
+            "game_id": row[0],
+            "number_of_hands": row[1],
+            "net_profit_loss": row[2],
+            "average_profit_loss": row[3],
+            "wallet": row[4]
+        }
+
+        if hand["wallet"] is not None:
+            # Updates the cached wallet once the new wallet is committed.
+            after_commit(wallet_cache.set, user_id, wallet)
+
+            # Replaces any older wallet waiting in the write-behind buffer once the new wallet
+            # is committed, so a later flush cannot overwrite it.
+            if write_buffer is not None:
+                after_commit(write_buffer.replace_wallet, user_id, wallet)
+
+    # Catches any errors connecting to the database, executing SQL or committing
+    # changes to the database.
+    except psycopg2.Error as e:
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
+        raise
+
+    # Catches any other errors.
+    except Exception as e:
+        logger.error("An error occurred: %s", e)
+        raise
+
+    # Returns the new game stats and wallet.
+    return hand
+
+
+def buffer_hand(user_id: int, game_id: int, game_stats: Dict[str, int],
+                profit_loss: int, wallet: int) -> Optional[Dict[str, int]]:
+    """
+    Adds a hand to the write-behind buffer instead of writing it to the database. The new game
+    stats are calculated from the game's current stats, which the caller already holds.
+
+    Args:
+        user_id (int): The user_id of the user who played the hand.
+        game_id (int): The game_id of the game being played.
+        game_stats (Dict[str, int]): The game's stats before this hand, as returned by `record_hand`.
+        profit_loss (int): The profit/loss of the hand.
+        wallet (int): The user's new wallet value.
+
+    Returns:
+        Optional[Dict[str, int]]: The new game stats and wallet in the form returned by
+                                  `record_hand`, or None if write-behind is disabled or the
+                                  buffer is full, in which case the hand must be recorded
+                                  with `record_hand`.
+
+    Example:
+        >>> buffer_hand(1, 3, {"number_of_hands": 1, "net_profit_loss": 20, "average_profit_loss": 20}, -10, 110)
+        {
+            "game_id": 3,
+            "number_of_hands": 2,
+            "net_profit_loss": 10,
+            "average_profit_loss": 5,
+            "wallet": 110
+        }
+    """
+    # Returns None so the hand is written immediately if write-behind is disabled.
+    if write_buffer is None:
+        return None
+
+    # Adds the hand to the buffer and updates the cached wallet, or returns None so the hand is
+    # written immediately if the buffer is full.
+    if not write_buffer.add_hand(game_id, user_id, profit_loss, wallet):
+        return None
+    wallet_cache.set(user_id, wallet)
+
+    # Calculates the new game stats in the same way as the SQL scripts.
+    number_of_hands = game_stats["number_of_hands"] + 1
+    net_profit_loss = game_stats["net_profit_loss"] + profit_loss
+
+    return {
+        "game_id": game_id,
+        "number_of_hands": number_of_hands,
+        "net_profit_loss": net_profit_loss,
+        "average_profit_loss": net_profit_loss // number_of_hands,
+        "wallet": wallet
+    }
+
+
+def flush_writes():
+    """
+    Writes the hands and wallets waiting in the write-behind buffer, so the queries that follow
+    see them. Views reading a user's games call this before their first query, since the flush
+    checks out a connection of its own: if the request already holds a connection, it is
+    released first (see `release_connection`) so the request never holds one connection while
+    waiting for another.
+
+    Raises:
+        psycopg2.Error: An error occurred when committing the request's transaction.
+
+    Example:
+        >>> flush_writes()
+        >>> count_games(1)
+        23
+    """
+    # Returns straight away if nothing is waiting to be written, which is the usual case.
+    if write_buffer is None or not write_buffer.has_pending():
+        return
+
+    # Returns the request's connection to the pool before waiting for the flush's connection.
+    if 'db_connection' in g:
+        release_connection()
+    write_buffer.flush()
+
+
 # =========================
 # 'wallets' table functions
 # =========================
-def update_wallet(wallet: int, username: str):
+def update_wallet(wallet: int, user_id: int):
     """
-    Gets and executes the SQL script to update a wallet for the given username.
+    Gets and executes the SQL script to update the wallet for the given user_id.
 
     Args:
         wallet (int): The new wallet value to be updated in the database.
-        username (str): The username of the account associated with the given wallet.
+        user_id (int): The user_id of the account associated with the given wallet.
 
     Raises:
         psycopg2.Error: An error occurred when connecting to the database, 
@@ -666,35 +1489,49 @@ def update_wallet(wallet: int, username: str):
         Exception: An unexpected error occurred.
 
     Example:
-        >>> update_wallet("username")
+        >>> update_wallet(120, 1)
     """
-    # Attempts to get and execute the SQL script to update the wallet for the given username in the database.
+    # Adds the wallet to the write-behind buffer instead if write-behind is enabled, unless
+    # the buffer is full.
+    if write_buffer is not None and write_buffer.set_wallet(user_id, wallet):
+        wallet_cache.set(user_id, wallet)
+        return
+
+    # Attempts to get and execute the SQL script to update the wallet for the given user_id in the database.
     try:
-        # Gets and executes the SQL script to update the wallet for the given username in the database.
-        sql_script = get_sql_script("wallets/update-wallet.sql")
-        cursor.execute(sql_script, (wallet, username))
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
 
-        # Commits the changes to the database.
-        connection.commit()
+        # Removes the cached wallet until the new wallet is committed.
+        wallet_cache.invalidate(user_id)
+
+        # Gets and executes the SQL script to update the wallet for the given user_id in the database.
+        execute_script(cursor, "wallets/update-wallet.sql", (wallet, user_id))
+
+        # Updates the cached wallet once the new wallet is committed.
+        after_commit(wallet_cache.set, user_id, wallet)
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
 
-def get_wallet(user_id: str) -> int:
+def get_wallet(user_id: str, cached: bool = True) -> int:
     """
     Gets and executes the SQL script to get the wallet value for the given user_id.
 
     Args:
         user_id (str): The user_id of the account for which the wallet value is to be retrieved.
+        cached (bool, optional): If False, the wallet is read from the database even if it is
+                                 cached, e.g. when the wallet will be written back. Defaults to True.
 
     Returns:
         int: An integer representing the value of the wallet for the given account.
@@ -708,27 +1545,40 @@ def get_wallet(user_id: str) -> int:
         >>> get_wallet("user_id")
         100
     """
+    # Returns the wallet waiting in the write-behind buffer, if there is one, since it is
+    # newer than the wallet in the database.
+    if write_buffer is not None:
+        wallet = write_buffer.pending_wallet(user_id)
+        if wallet is not None:
+            return wallet
+
+    # Returns the cached wallet, if there is one.
+    wallet = wallet_cache.lookup(user_id) if cached else None
+    if wallet is not None:
+        return wallet
+
     # Attempts to get and execute the SQL script to get the wallet for the given user_id in the database.
     try:
+        # Gets the connection and a cursor for the current request.
+        connection = get_connection()
+        cursor = connection.cursor()
+
         # Gets and executes the SQL script to get the wallet for the given user_id in the database.
-        sql_script = get_sql_script("wallets/get-wallet.sql")
-        cursor.execute(sql_script, (user_id,))
+        execute_script(cursor, "wallets/get-wallet.sql", (user_id,))
 
-        # Stores the wallet for the given user_id in a variable.
+        # Stores the wallet for the given user_id in a variable and caches it.
         wallet = cursor.fetchone()[0]
-
-        # Commits the changes to the database.
-        connection.commit()
+        wallet_cache.fill(user_id, wallet, g.db_wallet_generation)
 
     # Catches any errors connecting to the database, executing SQL or committing
     # changes to the database.
     except psycopg2.Error as e:
-        print("An error occurred connecting to the database, executing SQL or committing changes to the databse: ", e)
+        logger.error("An error occurred connecting to the database, executing SQL or committing changes to the databse: %s", e)
         raise
 
     # Catches any other errors.
     except Exception as e:
-        print("An error occurred: ", e)
+        logger.error("An error occurred: %s", e)
         raise
 
     # Returns the wallet value for the given user_id.
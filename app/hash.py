@@ -1,3 +1,16 @@
+import hashlib
+import os
+import struct
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+# NumPy is only needed by the batch functions with the pure-Python backend, which fall back to
+# hashing one password at a time.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
 def right_rotate(value: int, shift: int) -> int:
     """
     Perform a right rotation (a right shift where the bits that would usually 
@@ -18,128 +31,468 @@ def right_rotate(value: int, shift: int) -> int:
     return (value >> shift) | (value << (32 - shift)) & 0xFFFFFFFF
 
 
-def hash(password: str, salt: str) -> str:
+# Hash values:
+# The first 32 bits (stored in Hexadecimal) of the fractional parts of the square roots of the first 8 primes.
+INITIAL_HASH_VALUES = (
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+)
+
+# Round constants:
+# The first 32 bits (stored in Hexadecimal) of the fractional parts of the cube roots of the first 64 primes.
+ROUND_CONSTANTS = (
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5,
+    0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
+    0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc,
+    0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7,
+    0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
+    0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3,
+    0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5,
+    0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
+    0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+)
+
+
+def padding(length: int) -> bytes:
+    """
+    Get the padding added to the end of a message before it is compressed.
+
+    Args:
+        length (int): The length of the message in bytes.
+
+    Returns:
+        bytes: The padding, which makes the padded message a multiple of 64 bytes long.
+
+    Example:
+        >>> len(padding(3))
+        61
+    """
+    # Pre-processing (Padding):
+    # Append the bit '1', then 0 bits until the length is 64 bits short of a multiple of 512,
+    # then the length of the message (before pre-processing) as a 64-bit big-endian integer.
+    return b'\x80' + b'\x00' * ((55 - length) % 64) + (length * 8).to_bytes(8, 'big')
+
+
+def compress(state: list[int], chunk: Union[bytes, memoryview]):
+    """
+    Compress a 64 byte chunk into the hash state, updating the state in place.
+
+    Args:
+        state (list[int]): The eight 32 bit hash values.
+        chunk (Union[bytes, memoryview]): The 64 byte chunk to compress.
+    """
+
+    # Initialize the message schedule array of 32-bit words (currently blank).
+    # Labelled as 'w' for conciseness.
+    w = [0] * 64
+
+    # Initialize hash value for this chunk.
+    a, b, c, d, e, f, g, h = state
+
+    # Copy the chunk into the first 16 words of the message schedule array.
+    w[:16] = struct.unpack('>16L', chunk)
+
+    # Extend the first 16 words into the remaining 48 words of the message schedule array.
+    for i in range(16, 64):
+        s0 = right_rotate(
+            w[i - 15], 7) ^ right_rotate(w[i - 15], 18) ^ (w[i - 15] >> 3)
+        s1 = right_rotate(
+            w[i - 2], 17) ^ right_rotate(w[i - 2], 19) ^ (w[i - 2] >> 10)
+        w[i] = (w[i - 16] + s0 + w[i - 7] + s1) & 0xFFFFFFFF
+
+    # Compression function main loop.
+    for i in range(64):
+        S1 = right_rotate(e, 6) ^ right_rotate(e, 11) ^ right_rotate(e, 25)
+        ch = (e & f) ^ ((~e) & g)
+        temp1 = (h + S1 + ch + ROUND_CONSTANTS[i] + w[i]) & 0xFFFFFFFF
+        S0 = right_rotate(a, 2) ^ right_rotate(a, 13) ^ right_rotate(a, 22)
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        temp2 = (S0 + maj) & 0xFFFFFFFF
+
+        # & gates truncate the results to 32 bits.
+        h = g
+        g = f
+        f = e
+        e = (d + temp1) & 0xFFFFFFFF
+        d = c
+        c = b
+        b = a
+        a = (temp1 + temp2) & 0xFFFFFFFF
+
+    # Add the compressed chunk to the current hash value.
+    for i, value in enumerate((a, b, c, d, e, f, g, h)):
+        state[i] = (state[i] + value) & 0xFFFFFFFF
+
+
+class SHA256:
+    """
+    A SHA-256 hash object with the same interface as `hashlib.sha256`, implemented in pure Python.
+
+    Data is compressed 64 bytes at a time as it is passed to `update`: whole blocks are read
+    straight from the input through a memoryview, and only a partial block is copied into a
+    fixed 64 byte buffer, so data larger than memory can be hashed in pieces. `copy` returns an
+    independent object with the same state (the midstate), so a common prefix only has to be
+    compressed once.
+
+    Args:
+        data (bytes, optional): Data to hash straight away. Defaults to b''.
+
+    Example:
+        >>> prefix = SHA256(b"common prefix")
+        >>> first = prefix.copy()
+        >>> first.update(b"first suffix")
+        >>> first.hexdigest() == hashlib.sha256(b"common prefixfirst suffix").hexdigest()
+        True
+    """
+    name = "sha256"
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b''):
+        self._state = list(INITIAL_HASH_VALUES)
+        self._buffer = bytearray(self.block_size)
+        self._view = memoryview(self._buffer)
+        self._buffered = 0
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes):
+        """
+        Add data to the hash, compressing every block that has been completed.
+
+        Args:
+            data (bytes): The data to add, as any bytes-like object.
+
+        Raises:
+            TypeError: The data is not a bytes-like object (e.g. a string that has not been encoded).
+        """
+        if isinstance(data, str):
+            raise TypeError("Strings must be encoded before hashing")
+        data = memoryview(data).cast('B')
+        self._length += len(data)
+        position = 0
+
+        # Completes the buffered partial block first.
+        if self._buffered:
+            position = min(self.block_size - self._buffered, len(data))
+            self._view[self._buffered:self._buffered + position] = data[:position]
+            self._buffered += position
+            if self._buffered < self.block_size:
+                return
+            compress(self._state, self._view)
+            self._buffered = 0
+
+        # Compresses whole blocks without copying them, then buffers what is left.
+        end = len(data) - (len(data) - position) % self.block_size
+        for chunk_start in range(position, end, self.block_size):
+            compress(self._state, data[chunk_start:chunk_start + self.block_size])
+        self._buffered = len(data) - end
+        self._view[:self._buffered] = data[end:]
+
+    def copy(self) -> "SHA256":
+        """
+        Returns an independent copy of the hash object, including any buffered data.
+        """
+        other = SHA256()
+        other._state = self._state[:]
+        other._view[:] = self._view
+        other._buffered = self._buffered
+        other._length = self._length
+        return other
+
+    def digest(self) -> bytes:
+        """
+        Returns the digest of the data added so far. The object can still be updated afterwards.
+        """
+        # Pads the buffered partial block.
+        tail = bytes(self._view[:self._buffered]) + padding(self._length)
+
+        # Compresses the final one or two chunks into a copy of the state.
+        state = self._state[:]
+        for chunk_start in range(0, len(tail), 64):
+            compress(state, tail[chunk_start:chunk_start + 64])
+
+        # Produce the final hash value (big-endian).
+        return struct.pack('>8L', *state)
+
+    def hexdigest(self) -> str:
+        """
+        Returns the digest of the data added so far as a hexadecimal string.
+        """
+        return self.digest().hex()
+
+
+def sha256_python(message: bytes) -> bytes:
+    """
+    Compute the SHA-256 digest of the message in pure Python. This is the reference
+    implementation the faster backends are verified against.
+
+    Args:
+        message (bytes): The message to hash.
+
+    Returns:
+        bytes: The 32 byte SHA-256 digest.
+
+    Example:
+        >>> sha256_python(b"abc").hex()
+        'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+    """
+    return SHA256(message).digest()
+
+
+def sha256_hashlib(message: bytes) -> bytes:
+    """
+    Compute the SHA-256 digest of the message with hashlib's C implementation.
+
+    Args:
+        message (bytes): The message to hash.
+
+    Returns:
+        bytes: The 32 byte SHA-256 digest.
+
+    Example:
+        >>> sha256_hashlib(b"abc").hex()
+        'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+    """
+    return hashlib.sha256(message).digest()
+
+
+# ===========================
+# Hash backends
+# ===========================
+
+# The SHA-256 implementations `hash` can use, keyed by name.
+HASH_BACKENDS: Dict[str, Callable[[bytes], bytes]] = {
+    "hashlib": sha256_hashlib,
+    "python": sha256_python,
+}
+
+# The backend used by `hash` unless another is given. The pure-Python backend is only
+# intended as a reference, as it is several hundred times slower.
+HASH_BACKEND = os.getenv('HASH_BACKEND', 'hashlib')
+
+# NIST (FIPS 180-2 / CAVP) test vectors: each message and its SHA-256 digest.
+TEST_VECTORS: List[Tuple[bytes, str]] = [
+    (b"", "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"),
+    (b"abc", "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"),
+    (b"abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq",
+     "248d6a61d20638b8e5c026930c3e6039a33ce45964ff2167f6ecedd419db06c1"),
+    (b"abcdefghbcdefghicdefghijdefghijkefghijklfghijklmghijklmnhijklmnoijklmnopjklmnopqklmnopqrlmnopqrsmnopqrstnopqrstu",
+     "cf5b16a778af8380036ce59e7b0492370b249b11e8f07a51afac45037afee9d1"),
+    (b"a" * 1000000, "cdc76e5c9914fb9281a1c7e284d73e67f1809a48a497200e046d39ccc7112cd0"),
+]
+
+# Hashes stored by the original implementation of `hash`: each password, salt and stored hash.
+# Stored hashes drop leading zeros, so the second one is only 62 characters long.
+STORED_HASHES: List[Tuple[str, str, str]] = [
+    ("Hello world!", "88a176efbb5d47e09b120da915709666",
+     "dfc46e6e4973713658acdee143eb2c9a84d401080944e5c7f3aef0463fa398cc"),
+    ("password123", "0000000000000000000000000001847e",
+     "be6dbcf538bbb5237ac2aa54e00913d7862fba08df3a4d6a018aaba52411e7"),
+    ("correct horse battery staple" * 3, "9f1c2b7e4d3a5f6081726354a9b8c7d6",
+     "66ff8ba82f573844e51aa4afe69d2d82fe3347f4a05db67cd836a6c24977b9da"),
+]
+
+
+def verify_backend(name: str) -> List[str]:
+    """
+    Check a hash backend against the NIST test vectors and the hashes stored by the original
+    implementation of `hash`.
+
+    Args:
+        name (str): The name of the backend in `HASH_BACKENDS`.
+
+    Returns:
+        List[str]: A description of each check that failed (empty if the backend is correct).
+
+    Example:
+        >>> verify_backend("hashlib")
+        []
+    """
+    sha256 = HASH_BACKENDS[name]
+    failures = []
+
+    for message, expected in TEST_VECTORS:
+        digest = sha256(message).hex()
+        if digest != expected:
+            failures.append(f"{name}: SHA-256 of {message[:16]!r} ({len(message)} bytes) "
+                            f"is {digest}, expected {expected}")
+
+    for password, salt, expected in STORED_HASHES:
+        stored = hash(password, salt, backend=name)
+        if stored != expected:
+            failures.append(f"{name}: hash of {password!r} with salt {salt} "
+                            f"is {stored}, expected {expected}")
+
+    return failures
+
+
+def hash(password: str, salt: str, backend: str = None) -> str:
     """
     Compute the SHA-256 hash of the input password.
 
     Args:
         password (str): The input password to hash.
         salt (str): The salt to be added to the password to ensure the same password does not return the same hash.
+        backend (str, optional): The name of the backend in `HASH_BACKENDS` to use. Defaults to `HASH_BACKEND`.
 
     Returns:
-        str: The SHA-256 hash value as a hexadecimal string.
+        str: The SHA-256 hash value as a hexadecimal string, without leading zeros (the
+             format the hashes in the database were stored in).
 
     Example:
         >>> hash("Hello world!", 88a176efbb5d47e09b120da915709666)
         'dfc46e6e4973713658acdee143eb2c9a84d401080944e5c7f3aef0463fa398cc'
     """
+    sha256 = HASH_BACKENDS[backend or HASH_BACKEND]
+    digest = sha256((password + salt).encode('utf-8'))
 
-    # Hash values:
-    # The first 32 bits (stored in Hexadecimal) of the fractional parts of the square roots of the first 8 primes.
-    h0 = 0x6a09e667
-    h1 = 0xbb67ae85
-    h2 = 0x3c6ef372
-    h3 = 0xa54ff53a
-    h4 = 0x510e527f
-    h5 = 0x9b05688c
-    h6 = 0x1f83d9ab
-    h7 = 0x5be0cd19
-
-    # Round constants:
-    # The first 32 bits (stored in Hexadecimal) of the fractional parts of the cube roots of the first 64 primes.
-    k = [
-        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5,
-        0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
-        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
-        0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
-        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc,
-        0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
-        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7,
-        0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
-        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
-        0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
-        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3,
-        0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
-        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5,
-        0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
-        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
-        0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
-    ]
+    # Return the hash as a hexadecimal string.
+    return format(int.from_bytes(digest, 'big'), 'x')
 
-    # Pre-processing (Padding):
-    original_password = (password + salt).encode('utf-8')
-    password_length = len(original_password) * 8
-
-    # Append the bit '1' to the password.
-    original_password += b'\x80'
-
-    # Add 0 bits until the password is a multiple of 512.
-    original_password += b'\x00' * ((56 - len(original_password) % 64) % 64)
-
-    # Append length of password (before pre-processing) as 64-bit big-endian integer.
-    original_password += password_length.to_bytes(8, 'big')
-
-    # Process the password in successive 512-bit chunks.
-    for chunk_start in range(0, len(original_password), 64):
-        chunk = original_password[chunk_start:chunk_start + 64]
-
-        # Initialize the password schedule array of 32-bit words (currently blank).
-        # Labelled as 'w' for conciseness.
-        w = [0] * 64
-
-        # Initialize hash value for this chunk.
-        a = h0
-        b = h1
-        c = h2
-        d = h3
-        e = h4
-        f = h5
-        g = h6
-        h = h7
-
-        # Extend the first 16 words into the remaining 48 words of the password schedule array.
-        for i in range(16):
-            w[i] = int.from_bytes(chunk[i * 4:i * 4 + 4], 'big')
-
-            for i in range(16, 64):
-                s0 = right_rotate(
-                    w[i - 15], 7) ^ right_rotate(w[i - 15], 18) ^ (w[i - 15] >> 3)
-                s1 = right_rotate(
-                    w[i - 2], 17) ^ right_rotate(w[i - 2], 19) ^ (w[i - 2] >> 10)
-                w[i] = (w[i - 16] + s0 + w[i - 7] + s1) & 0xFFFFFFFF
-
-        # Compression function main loop.
-        for i in range(64):
-            S1 = right_rotate(e, 6) ^ right_rotate(e, 11) ^ right_rotate(e, 25)
-            ch = (e & f) ^ ((~e) & g)
-            temp1 = (h + S1 + ch + k[i] + w[i]) & 0xFFFFFFFF
-            S0 = right_rotate(a, 2) ^ right_rotate(a, 13) ^ right_rotate(a, 22)
-            maj = (a & b) ^ (a & c) ^ (b & c)
-            temp2 = (S0 + maj) & 0xFFFFFFFF
-
-            # & gates truncate the results to 32 bits.
-            h = g
-            g = f
-            f = e
-            e = (d + temp1) & 0xFFFFFFFF
-            d = c
-            c = b
-            b = a
-            a = (temp1 + temp2) & 0xFFFFFFFF
-
-        # Add the compressed chunk to the current hash value.
-        h0 = (h0 + a) & 0xFFFFFFFF
-        h1 = (h1 + b) & 0xFFFFFFFF
-        h2 = (h2 + c) & 0xFFFFFFFF
-        h3 = (h3 + d) & 0xFFFFFFFF
-        h4 = (h4 + e) & 0xFFFFFFFF
-        h5 = (h5 + f) & 0xFFFFFFFF
-        h6 = (h6 + g) & 0xFFFFFFFF
-        h7 = (h7 + h) & 0xFFFFFFFF
-
-    # Produce the final hash value (big-endian).
-    digest = (h0 << 224) | (h1 << 192) | (h2 << 160) | (
-        h3 << 128) | (h4 << 96) | (h5 << 64) | (h6 << 32) | h7
 
-    # Return the hash as a hexadecimal string.
-    return hex(digest)[2:]
+# ===========================
+# Batch hashing
+# ===========================
+
+# The smallest batch hashed in NumPy lanes. Smaller batches are hashed one message at a time,
+# since the per-chunk cost of the NumPy loop is only repaid once it is shared by enough lanes.
+LANES_MIN_BATCH = 32
+
+
+def right_rotate_lanes(values, shift: int):
+    """
+    Perform a right rotation on every 32 bit value in a NumPy uint32 array.
+
+    Args:
+        values (numpy.ndarray): The uint32 values to rotate.
+        shift (int): The number of bits to shift.
+
+    Returns:
+        numpy.ndarray: The rotated values.
+    """
+    return (values >> shift) | (values << (32 - shift))
+
+
+def compress_lanes(state, chunks):
+    """
+    Compress one 64 byte chunk of every message into its hash state at once. Each message is
+    a lane of the arrays, and uint32 arithmetic wraps around, so no masking is needed.
+
+    Args:
+        state (numpy.ndarray): The hash values, a uint32 array of shape (8, lanes), updated in place.
+        chunks (numpy.ndarray): The chunk of each message as 16 words, a uint32 array of shape (16, lanes).
+    """
+    # Initialize the message schedule array, copying the chunks into its first 16 words.
+    w = numpy.empty((64, chunks.shape[1]), dtype=numpy.uint32)
+    w[:16] = chunks
+
+    # Extend the first 16 words into the remaining 48 words of the message schedule array.
+    for i in range(16, 64):
+        s0 = right_rotate_lanes(w[i - 15], 7) ^ right_rotate_lanes(w[i - 15], 18) ^ (w[i - 15] >> 3)
+        s1 = right_rotate_lanes(w[i - 2], 17) ^ right_rotate_lanes(w[i - 2], 19) ^ (w[i - 2] >> 10)
+        w[i] = w[i - 16] + s0 + w[i - 7] + s1
+
+    # Initialize hash value for this chunk.
+    a, b, c, d, e, f, g, h = state
+
+    # Compression function main loop.
+    for i in range(64):
+        S1 = right_rotate_lanes(e, 6) ^ right_rotate_lanes(e, 11) ^ right_rotate_lanes(e, 25)
+        ch = (e & f) ^ (~e & g)
+        temp1 = h + S1 + ch + numpy.uint32(ROUND_CONSTANTS[i]) + w[i]
+        S0 = right_rotate_lanes(a, 2) ^ right_rotate_lanes(a, 13) ^ right_rotate_lanes(a, 22)
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        temp2 = S0 + maj
+
+        h = g
+        g = f
+        f = e
+        e = d + temp1
+        d = c
+        c = b
+        b = a
+        a = temp1 + temp2
+
+    # Add the compressed chunk to the current hash value.
+    state += numpy.stack((a, b, c, d, e, f, g, h))
+
+
+def sha256_batch(messages: List[bytes], backend: str = None) -> List[bytes]:
+    """
+    Compute the SHA-256 digest of many messages at once.
+
+    With the hashlib backend each message is hashed with hashlib, whose C implementation is
+    faster than any batching done in Python. With the pure-Python backend, batches of at least
+    `LANES_MIN_BATCH` messages are hashed with NumPy instead: messages are grouped by the
+    number of 64 byte chunks they pad to, and each group is compressed chunk by chunk with
+    every message in the group as a lane of uint32 arrays, so the cost of the Python loop is
+    shared by the whole group. Smaller batches, or any batch without NumPy, are hashed one
+    message at a time with the backend.
+
+    Args:
+        messages (List[bytes]): The messages to hash.
+        backend (str, optional): The name of the backend in `HASH_BACKENDS` to use. Defaults to `HASH_BACKEND`.
+
+    Returns:
+        List[bytes]: The 32 byte SHA-256 digest of each message, in the same order.
+
+    Example:
+        >>> [digest.hex()[:8] for digest in sha256_batch([b"abc", b""])]
+        ['ba7816bf', 'e3b0c442']
+    """
+    sha256 = HASH_BACKENDS[backend or HASH_BACKEND]
+    if sha256 is not sha256_python or numpy is None or len(messages) < LANES_MIN_BATCH:
+        return [sha256(message) for message in messages]
+
+    # Groups the messages by the number of chunks they pad to.
+    groups: Dict[int, List[int]] = {}
+    for index, message in enumerate(messages):
+        groups.setdefault(len(message) // 64 + (2 if len(message) % 64 > 55 else 1), []).append(index)
+
+    digests: List[bytes] = [b''] * len(messages)
+    for number_of_chunks, indices in groups.items():
+        # Pads every message in the group and reads them as big-endian words, one lane per message.
+        padded = b''.join(messages[i] + padding(len(messages[i])) for i in indices)
+        words = numpy.frombuffer(padded, dtype='>u4').astype(numpy.uint32)
+        words = words.reshape(len(indices), number_of_chunks, 16).transpose(1, 2, 0)
+
+        # Compresses the chunks of every message in the group at once.
+        state = numpy.repeat(numpy.array(INITIAL_HASH_VALUES, dtype=numpy.uint32)[:, None],
+                             len(indices), axis=1)
+        for chunk in words:
+            compress_lanes(state, chunk)
+
+        # Produce the final hash values (big-endian).
+        output = state.T.astype('>u4').tobytes()
+        for lane, index in enumerate(indices):
+            digests[index] = output[lane * 32:lane * 32 + 32]
+
+    return digests
+
+
+def hash_batch(credentials: Iterable[Tuple[str, str]], backend: str = None) -> List[str]:
+    """
+    Compute the SHA-256 hash of many passwords at once, e.g. to audit or re-hash every account.
+
+    Args:
+        credentials (Iterable[Tuple[str, str]]): The password and salt of each account.
+        backend (str, optional): The name of the backend in `HASH_BACKENDS` to use. Defaults to `HASH_BACKEND`.
+
+    Returns:
+        List[str]: The hash of each password, identical to `hash(password, salt)`.
+
+    Example:
+        >>> hash_batch([("Hello world!", "88a176efbb5d47e09b120da915709666")])
+        ['dfc46e6e4973713658acdee143eb2c9a84d401080944e5c7f3aef0463fa398cc']
+    """
+    digests = sha256_batch([(password + salt).encode('utf-8') for password, salt in credentials], backend)
+    return [format(int.from_bytes(digest, 'big'), 'x') for digest in digests]
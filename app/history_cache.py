@@ -0,0 +1,307 @@
+import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Union
+from .sort import CATEGORICAL_ORDERS, SELECT_RATIO, row_keys, select_indices, sort_indices
+
+
+# ==================
+# Game history cache
+# ==================
+class HistoryEntry:
+    """
+    A user's game history together with the sort orders computed for it so far.
+
+    The rows are kept in `game_id` order, so sorting them stably by a column orders rows with
+    equal values by `game_id` (the same tie-break used by the database). Every position in an
+    order is then unique and the descending order is exactly the ascending order reversed.
+
+    Args:
+        user_id (int): The user_id of the user whose games these are.
+        rows (list[list]): The user's games, in the form returned by `get_all_games`.
+        game_ids (list[int]): The `game_id` of each row.
+    """
+
+    def __init__(self, user_id: int, rows: list[list], game_ids: list[int]):
+        self.user_id = user_id
+        order = sort_indices(game_ids)
+        self.rows = [rows[i] for i in order]
+        self.game_ids = [game_ids[i] for i in order]
+        self.created = time.monotonic()
+
+        # The ascending permutation of the rows for each column, computed when first needed.
+        self.permutations: Dict[int, list[int]] = {}
+        self.size = estimate_size(self.rows) + estimate_size(self.game_ids)
+
+
+def estimate_size(values: list) -> int:
+    """
+    Estimates the memory used by a list of rows or integers, extrapolating from its first item.
+
+    Args:
+        values (list): The list to measure.
+
+    Returns:
+        int: The estimated size in bytes.
+
+    Example:
+        >>> estimate_size(list(range(1000, 2000)))
+        36056
+    """
+    size = sys.getsizeof(values)
+    if values:
+        item = values[0]
+        item_size = sys.getsizeof(item)
+        if isinstance(item, list):
+            item_size += sum(sys.getsizeof(value) for value in item)
+        size += item_size * len(values)
+    return size
+
+
+def row_key(entry: HistoryEntry, index: int, column: int) -> list:
+    """
+    Gets the key of a row in the form used by `get_games_page`, so a page found in the cache
+    can be continued from the database and vice versa.
+
+    Args:
+        entry (HistoryEntry): The user's game history.
+        index (int): The index of the row.
+        column (int): The index of the column the rows are sorted by.
+
+    Returns:
+        list: The row's sort key (dates and times as ISO strings) and `game_id`.
+
+    Example:
+        >>> row_key(entry, 0, 5)
+        [0, 12]
+    """
+    value = row_keys([entry.rows[index]], column)[0]
+    if isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    return [value, entry.game_ids[index]]
+
+
+class HistoryCache:
+    """
+    An in-process, least-recently-used cache of each user's game history and its sort orders.
+
+    The game history page sorts the same rows in up to 12 ways and flips between pages of
+    them. The cache fetches a user's history once and stores each column's ascending
+    permutation (an array of row indices) when it is first needed; the descending order reuses
+    the ascending permutation. Entries expire after `ttl` seconds (so hands recorded by other
+    workers are picked up) and are evicted, least recently used first, to keep the total
+    estimated size within `max_bytes`.
+
+    A user whose history is too large to fit in the budget is remembered for `ttl` seconds, so
+    their history is not loaded (and thrown away) again on every request. A history loaded
+    while the user's games were changing is used for that request but not stored.
+
+    Args:
+        max_bytes (int): The memory budget, in bytes. A budget of 0 disables the cache.
+        ttl (float): The number of seconds an entry is used for before it is fetched again.
+
+    Example:
+        >>> cache = HistoryCache(8 * 1024 * 1024, 60)
+        >>> entry = cache.get(1, lambda: get_games_page(1))
+        >>> cache.page(entry, 3, True, 0, 7)
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, HistoryEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # The number of invalidations made so far, and the time each user whose history was
+        # too large to cache was last found to be too large.
+        self._generation = 0
+        self._oversized: Dict[int, float] = {}
+
+        # Counters used to size the memory budget.
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _evict(self):
+        """
+        Evicts the least recently used entries until the cache is within its memory budget.
+        Must be called with the lock held.
+        """
+        while self._size > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self._evictions += 1
+
+    def get(self, user_id: int,
+            load: Callable[[], Tuple[list[list], list[list]]]) -> Optional[HistoryEntry]:
+        """
+        Gets the user's cached game history, loading it on a miss.
+
+        Args:
+            user_id (int): The user_id of the user whose game history is requested.
+            load (Callable[[], Tuple[list[list], list[list]]]): Loads the user's games and their
+                keys, in the form returned by `get_games_page`.
+
+        Returns:
+            Optional[HistoryEntry]: The user's game history, or None if the cache is disabled or
+                                    the history is too large to fit in the memory budget.
+        """
+        if not self.enabled:
+            return None
+
+        # Returns the cached entry if it has not expired, marking it as recently used.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry.created < self.ttl:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry
+
+            # Skips loading a history that was too large to cache the last time it was loaded.
+            found = self._oversized.get(user_id)
+            if found is not None and now - found < self.ttl:
+                return None
+            self._misses += 1
+            generation = self._generation
+
+        # Loads the history outside the lock so other users are not kept waiting.
+        games, keys = load()
+        entry = HistoryEntry(user_id, games, [key[1] for key in keys])
+        if entry.size > self.max_bytes:
+            with self._lock:
+                self._oversized = {oversized_id: found for oversized_id, found in self._oversized.items()
+                                   if now - found < self.ttl}
+                self._oversized[user_id] = now
+            return None
+
+        with self._lock:
+            # Uses the history without storing it if a hand was recorded while it was loading,
+            # since it may not include that hand.
+            if self._generation != generation:
+                return entry
+
+            previous = self._entries.pop(user_id, None)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[user_id] = entry
+            self._size += entry.size
+            self._evict()
+
+        return entry
+
+    def order(self, entry: HistoryEntry, column: int, reverse: bool = False) -> list[int]:
+        """
+        Gets the order of the entry's rows for the given column, computing and caching the
+        ascending permutation the first time the column is used.
+
+        Args:
+            entry (HistoryEntry): The user's game history.
+            column (int): The index of the column to sort by.
+            reverse (bool, optional): If True, the order is descending. Defaults to False.
+
+        Returns:
+            list[int]: The indices of the rows in sorted order.
+        """
+        permutation = entry.permutations.get(column)
+        if permutation is None:
+            sort_order = CATEGORICAL_ORDERS.get(column)
+            buckets = len(sort_order) + 1 if sort_order is not None else None
+            permutation = sort_indices(row_keys(entry.rows, column), buckets=buckets)
+
+            # Accounts for the permutation's memory, evicting other entries if needed.
+            with self._lock:
+                if column not in entry.permutations:
+                    entry.permutations[column] = permutation
+                    size = estimate_size(permutation)
+                    entry.size += size
+                    if self._entries.get(entry.user_id) is entry:
+                        self._size += size
+                        self._evict()
+
+        # The rows are unique in (value, game_id), so the descending order is the reverse.
+        return permutation[::-1] if reverse else permutation
+
+    def page(self, entry: HistoryEntry, column: int, reverse: bool,
+             offset: int, limit: int) -> Tuple[list[list], list[list]]:
+        """
+        Gets a page of the entry's rows in the given order. Early pages of a column that has not
+        been sorted yet are selected with a partial sort; later pages sort the column once and
+        store its permutation for the following pages.
+
+        Args:
+            entry (HistoryEntry): The user's game history.
+            column (int): The index of the column to sort by.
+            reverse (bool): If True, the order is descending.
+            offset (int): The position of the first row of the page.
+            limit (int): The number of rows in the page.
+
+        Returns:
+            Tuple[list[list], list[list]]: Copies of the rows in the page and the key of each row,
+                                           in the form returned by `get_games_page`.
+        """
+        permutation = entry.permutations.get(column)
+        number_of_rows = len(entry.rows)
+
+        # Selects early pages with a partial sort rather than sorting every row. In descending
+        # order, rows with equal values are selected in descending `game_id` order, matching
+        # the reversed ascending permutation.
+        if permutation is None and (offset + limit) * SELECT_RATIO <= number_of_rows:
+            indices = range(number_of_rows - 1, -1, -1) if reverse else None
+            indices = select_indices(row_keys(entry.rows, column), offset, limit, reverse, indices)
+
+        # Otherwise, slices the page from the column's permutation, taking descending pages from
+        # the end of the ascending permutation without reversing it.
+        elif reverse:
+            permutation = self.order(entry, column)
+            end = max(number_of_rows - offset, 0)
+            indices = permutation[max(end - limit, 0):end][::-1]
+        else:
+            permutation = self.order(entry, column)
+            indices = permutation[offset:offset + limit]
+        return [entry.rows[i][:] for i in indices], [row_key(entry, i, column) for i in indices]
+
+    def invalidate(self, user_id: int):
+        """
+        Removes the user's game history, e.g. after a hand has been recorded for them.
+
+        Args:
+            user_id (int): The user_id of the user whose game history has changed.
+        """
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the cache's counters.
+
+        Returns:
+            Dict[str, Union[int, float]]: A dictionary containing the following keys:
+                - "entries" (int): The number of users whose history is cached.
+                - "bytes" (int): The estimated memory used by the cache.
+                - "max_bytes" (int): The memory budget.
+                - "hits" (int): The number of requests served from the cache.
+                - "misses" (int): The number of requests that loaded the history.
+                - "evictions" (int): The number of entries evicted to stay within the budget.
+                - "oversized" (int): The number of users whose history is too large to cache.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "oversized": len(self._oversized),
+            }
@@ -0,0 +1,143 @@
+import hmac
+import os
+from flask import Blueprint, Response, abort, jsonify, request
+from .db import (get_cache_stats, get_pool_stats, get_query_stats, password_hasher,
+                 write_buffer)
+from .metrics import prometheus_text
+from .response_cache import response_cache
+
+# Renders all the routes in a blueprint.
+internal = Blueprint("internal", __name__)
+
+# The token that must be sent to read the internal endpoints. The endpoints are disabled
+# (and respond with 404) unless it is set.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+
+# =================
+# General functions
+# =================
+@internal.before_request
+def require_token():
+    """
+    This function is called before each request. It hides the internal endpoints unless a
+    metrics token is configured, and rejects requests that do not send it, either as a bearer
+    token in the Authorization header or as the `token` query parameter.
+    """
+    if not METRICS_TOKEN:
+        abort(404)
+
+    token = request.args.get('token', '')
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        token = authorization[len('Bearer '):]
+
+    if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        abort(401)
+
+
+def collect_metrics() -> dict:
+    """
+    Gets the counters of the query metrics, connection pool, caches, response cache, password
+    hasher and write-behind buffer of this process.
+
+    Returns:
+        dict: The counters of each component, keyed by its name.
+    """
+    return {
+        "queries": get_query_stats(),
+        "pool": get_pool_stats(),
+        "caches": get_cache_stats(),
+        "responses": response_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "write_behind": write_buffer.stats() if write_buffer is not None else None,
+    }
+
+
+# ================
+# Metric functions
+# ================
+@internal.route('/metrics')
+def metrics():
+    """
+    Returns the counters of this process as JSON.
+
+    Returns:
+        A JSON response containing the counters described in `collect_metrics`.
+    """
+    return jsonify(collect_metrics())
+
+
+@internal.route('/metrics/prometheus')
+def prometheus_metrics():
+    """
+    Returns the counters of this process in the Prometheus text exposition format.
+
+    Returns:
+        A plain text response in the Prometheus text format.
+    """
+    collected = collect_metrics()
+    statements = collected["queries"]["statements"]
+    requests = collected["queries"]["requests"]
+    pool = collected["pool"]
+    caches = collected["caches"]
+    responses = collected["responses"]
+    hasher = collected["password_hasher"]
+
+    def per_statement(key: str) -> list:
+        return [({"statement": name}, counters[key]) for name, counters in sorted(statements.items())]
+
+    def per_cache(key: str) -> list:
+        return [({"cache": name}, counters[key]) for name, counters in sorted(caches.items())]
+
+    families = [
+        ("db_statement_executions_total", "counter", "Executions of each SQL statement.",
+         per_statement("count")),
+        ("db_statement_seconds_total", "counter", "Time spent executing each SQL statement.",
+         per_statement("total_time")),
+        ("db_statement_max_seconds", "gauge", "Longest execution of each SQL statement.",
+         per_statement("max_time")),
+        ("db_statement_rows_total", "counter", "Rows returned by each SQL statement.",
+         per_statement("rows")),
+        ("db_statement_errors_total", "counter", "Failed executions of each SQL statement.",
+         per_statement("errors")),
+        ("db_requests_total", "counter", "Requests handled.", [({}, requests["requests"])]),
+        ("db_request_queries_total", "counter", "Queries made by requests.", [({}, requests["queries"])]),
+        ("db_request_max_queries", "gauge", "Most queries made by a single request.",
+         [({}, requests["max_queries"])]),
+        ("db_pool_max_size", "gauge", "Maximum connections in the pool.", [({}, pool["max_size"])]),
+        ("db_pool_in_use", "gauge", "Connections checked out of the pool.", [({}, pool["in_use"])]),
+        ("db_pool_checkouts_total", "counter", "Connections checked out of the pool.",
+         [({}, pool["checkouts"])]),
+        ("db_pool_timeouts_total", "counter", "Checkouts that timed out.", [({}, pool["timeouts"])]),
+        ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.",
+         [({}, pool["total_wait"])]),
+        ("cache_hits_total", "counter", "Lookups served from each cache.", per_cache("hits")),
+        ("cache_misses_total", "counter", "Lookups that missed each cache.", per_cache("misses")),
+        ("cache_evictions_total", "counter", "Entries evicted from each cache.", per_cache("evictions")),
+        ("cache_entries", "gauge", "Entries in each cache.", per_cache("entries")),
+        ("response_cache_hits_total", "counter", "Pages served from the response cache.",
+         [({}, responses["hits"])]),
+        ("response_cache_misses_total", "counter", "Pages rendered and added to the response cache.",
+         [({}, responses["misses"])]),
+        ("response_cache_not_modified_total", "counter", "Cached pages answered with 304 Not Modified.",
+         [({}, responses["not_modified"])]),
+        ("response_cache_bytes", "gauge", "Size of the cached pages.", [({}, responses["bytes"])]),
+        ("password_hashes_total", "counter", "Passwords hashed.", [({}, hasher["completed"])]),
+        ("password_hashes_rejected_total", "counter", "Password hashes refused because the queue was full.",
+         [({}, hasher["rejected"])]),
+        ("password_hash_timeouts_total", "counter", "Password hashes that were not ready in time.",
+         [({}, hasher["timeouts"])]),
+    ]
+
+    # Adds the write-behind buffer's counters if it is enabled.
+    if collected["write_behind"] is not None:
+        buffer = collected["write_behind"]
+        families += [
+            ("write_behind_pending", "gauge", "Games and wallets waiting to be written.",
+             [({}, buffer["pending"])]),
+            ("write_behind_flushes_total", "counter", "Successful flushes.", [({}, buffer["flushes"])]),
+            ("write_behind_failures_total", "counter", "Failed flushes.", [({}, buffer["failures"])]),
+        ]
+
+    return Response(prometheus_text(families), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,293 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple, Union
+from .hash import hash
+
+
+# ===========================
+# Password hash format
+# ===========================
+
+# The version of the hash format, stored in every hash so the format can change later.
+FORMAT_VERSION = 1
+
+# The key derivation functions passwords can be hashed with.
+SCHEMES = ("pbkdf2-sha256", "scrypt")
+
+# The block size and parallelism used with scrypt (the cost is its CPU/memory cost, N).
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+
+# The length of the derived key, in bytes.
+KEY_LENGTH = 32
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the password hasher's queue is full or a password could not be checked in time.
+    """
+
+
+def derive_key(scheme: str, cost: int, password: str, salt: str) -> bytes:
+    """
+    Derives a key from the password and salt with the given key derivation function.
+    Both functions release the GIL while they run, so keys can be derived in parallel threads.
+
+    Args:
+        scheme (str): The key derivation function, one of `SCHEMES`.
+        cost (int): The number of iterations for PBKDF2, or the CPU/memory cost (a power of 2) for scrypt.
+        password (str): The password to derive the key from.
+        salt (str): The user's salt.
+
+    Returns:
+        bytes: The derived key.
+
+    Raises:
+        ValueError: The scheme is not supported.
+
+    Example:
+        >>> derive_key("pbkdf2-sha256", 600000, "password", "88a176efbb5d47e09b120da915709666").hex()
+        '9a3ee6772f47056ca91b84cadd31f3df80373736d4833a9750de86e494e0b6d2'
+    """
+    if scheme == "pbkdf2-sha256":
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'),
+                                   cost, KEY_LENGTH)
+    if scheme == "scrypt":
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'), n=cost,
+                              r=SCRYPT_BLOCK_SIZE, p=SCRYPT_PARALLELISM,
+                              maxmem=256 * SCRYPT_BLOCK_SIZE * cost, dklen=KEY_LENGTH)
+    raise ValueError(f"Unsupported password hashing scheme: {scheme}")
+
+
+def encode_hash(scheme: str, cost: int, key: bytes) -> str:
+    """
+    Encodes a derived key in the versioned hash format, `$<scheme>$v=<version>$c=<cost>$<key>`.
+
+    Args:
+        scheme (str): The key derivation function the key was derived with.
+        cost (int): The cost the key was derived with.
+        key (bytes): The derived key.
+
+    Returns:
+        str: The encoded hash, as stored in the accounts table.
+
+    Example:
+        >>> encode_hash("pbkdf2-sha256", 600000, key)
+        '$pbkdf2-sha256$v=1$c=600000$9a3ee677...'
+    """
+    return f"${scheme}$v={FORMAT_VERSION}$c={cost}${key.hex()}"
+
+
+def parse_hash(stored_hash: str) -> Optional[Tuple[str, int, int, str]]:
+    """
+    Parses a hash in the versioned hash format.
+
+    Args:
+        stored_hash (str): The hash stored in the accounts table.
+
+    Returns:
+        Optional[Tuple[str, int, int, str]]: The scheme, format version, cost and hexadecimal key,
+                                             or None if the hash is a legacy SHA-256 hash.
+
+    Raises:
+        ValueError: The hash starts with `$` but is not in the versioned hash format.
+
+    Example:
+        >>> parse_hash("$pbkdf2-sha256$v=1$c=600000$9a3ee677...")
+        ('pbkdf2-sha256', 1, 600000, '9a3ee677...')
+    """
+    # Legacy hashes are plain hexadecimal strings.
+    if not stored_hash.startswith('$'):
+        return None
+
+    _, scheme, version, cost, key = stored_hash.split('$')
+    if not version.startswith('v=') or not cost.startswith('c='):
+        raise ValueError(f"Malformed password hash for scheme: {scheme}")
+    return scheme, int(version[2:]), int(cost[2:]), key
+
+
+# ===========================
+# Password hasher class
+# ===========================
+class PasswordHasher:
+    """
+    Hashes and checks passwords with a slow key derivation function on a bounded pool of
+    worker threads.
+
+    Key derivation is deliberately CPU-bound, so it is kept off the request threads: at most
+    `workers` passwords are hashed at once and at most `queue_limit` more wait for a worker.
+    Once the queue is full new requests are refused with `PasswordHasherBusy` straight away,
+    so a burst of logins cannot take every CPU away from the rest of the site. The pool is
+    created lazily in each process, so it is safe to create the hasher before gunicorn forks.
+
+    Args:
+        scheme (str): The key derivation function new hashes use, one of `SCHEMES`.
+        cost (int): The cost new hashes use (PBKDF2 iterations, or scrypt's N).
+        workers (int): The number of passwords that can be hashed at once.
+        queue_limit (int): The number of passwords that can wait for a worker.
+        timeout (float): The number of seconds a request waits for its password to be checked.
+
+    Example:
+        >>> hasher = PasswordHasher("pbkdf2-sha256", 600000, 2, 16, 10)
+        >>> stored_hash = hasher.hash("password", salt)
+        >>> hasher.verify("password", salt, stored_hash)
+        True
+    """
+
+    def __init__(self, scheme: str, cost: int, workers: int, queue_limit: int, timeout: float):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unsupported password hashing scheme: {scheme}")
+        self.scheme = scheme
+        self.cost = cost
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+
+        # The process the worker pool belongs to, the pool itself and the slots for queued work.
+        self._pid = None
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+        # Counters used to size the pool.
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._total_time = 0.0
+
+    def _get_executor(self) -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+        """
+        Gets the worker pool for the current process, creating it on first use or after a fork.
+        """
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="password-hasher")
+                    self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+                    self._pid = pid
+        return self._executor, self._slots
+
+    def start(self):
+        """
+        Creates the worker pool in the current process now rather than on the first password.
+        """
+        self._get_executor()
+
+    def _run(self, function: Callable, *args):
+        """
+        Runs the function on the worker pool and waits for its result.
+
+        Raises:
+            PasswordHasherBusy: The queue is full, or the result was not ready within the timeout.
+        """
+        executor, slots = self._get_executor()
+
+        # Refuses the work rather than queueing it without limit.
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy("Too many passwords are waiting to be checked")
+
+        start = time.monotonic()
+        try:
+            future = executor.submit(function, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise PasswordHasherBusy("The password could not be checked in time")
+
+        with self._lock:
+            self._completed += 1
+            self._total_time += time.monotonic() - start
+        return result
+
+    def hash(self, password: str, salt: str) -> str:
+        """
+        Hashes the password with the configured key derivation function and cost.
+
+        Args:
+            password (str): The password to hash.
+            salt (str): The user's salt.
+
+        Returns:
+            str: The hash in the versioned hash format.
+
+        Raises:
+            PasswordHasherBusy: The password could not be hashed right now.
+        """
+        key = self._run(derive_key, self.scheme, self.cost, password, salt)
+        return encode_hash(self.scheme, self.cost, key)
+
+    def verify(self, password: str, salt: str, stored_hash: str) -> bool:
+        """
+        Checks the password against a stored hash, in either the versioned or the legacy format.
+
+        Args:
+            password (str): The password to check.
+            salt (str): The user's salt.
+            stored_hash (str): The hash stored in the accounts table.
+
+        Returns:
+            bool: A boolean indicating whether the password is correct.
+
+        Raises:
+            PasswordHasherBusy: The password could not be checked right now.
+        """
+        parsed = parse_hash(stored_hash)
+
+        # Legacy hashes are a single SHA-256, which is cheap enough to check in the request thread.
+        if parsed is None:
+            return hmac.compare_digest(hash(password, salt), stored_hash)
+
+        scheme, _, cost, key = parsed
+        derived = self._run(derive_key, scheme, cost, password, salt)
+        return hmac.compare_digest(derived.hex(), key)
+
+    def needs_upgrade(self, stored_hash: str) -> bool:
+        """
+        Checks whether a stored hash should be replaced with one using the current settings.
+
+        Args:
+            stored_hash (str): The hash stored in the accounts table.
+
+        Returns:
+            bool: True if the hash is a legacy hash or uses another scheme, version or cost.
+        """
+        parsed = parse_hash(stored_hash)
+        return parsed is None or parsed[:3] != (self.scheme, FORMAT_VERSION, self.cost)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the hasher's counters.
+
+        Returns:
+            Dict[str, Union[int, float]]: A dictionary containing the following keys:
+                - "workers" (int): The number of passwords that can be hashed at once.
+                - "queue_limit" (int): The number of passwords that can wait for a worker.
+                - "completed" (int): The number of passwords hashed.
+                - "rejected" (int): The number of requests refused because the queue was full.
+                - "timeouts" (int): The number of requests that gave up waiting.
+                - "total_time" (float): The total seconds spent waiting for and hashing passwords.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "total_time": self._total_time,
+            }
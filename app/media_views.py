@@ -0,0 +1,243 @@
+import datetime
+import mmap
+import os
+import uuid
+from typing import Iterator, List, Optional, Tuple, Union
+from flask import Blueprint, Response, abort, current_app, request
+from werkzeug.http import http_date, is_resource_modified, parse_date
+from werkzeug.security import safe_join
+from .cache import TTLCache
+
+# Renders all the routes in a blueprint.
+media = Blueprint("media", __name__)
+
+# The folder the videos are served from, relative to the static folder, and the file types served.
+MEDIA_FOLDER = 'img'
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+}
+
+# The number of seconds browsers may reuse a video before checking it has not changed.
+MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', 24 * 60 * 60))
+
+# The most ranges answered in one multipart response. Requests for more get the whole file.
+MAX_RANGES = 16
+
+# The number of bytes sent at a time when the server cannot send the file itself.
+CHUNK_SIZE = 256 * 1024
+
+# The size, modification time and ETag of each video, kept briefly so each range request
+# does not stat the file again.
+metadata_cache = TTLCache(int(os.getenv('MEDIA_METADATA_CACHE_SIZE', 256)),
+                          float(os.getenv('MEDIA_METADATA_CACHE_TTL', 10)))
+
+
+# =================
+# General functions
+# =================
+def get_metadata(path: str) -> Optional[Tuple[int, datetime.datetime, str]]:
+    """
+    Gets the size, modification time and ETag of a file, from `metadata_cache` if possible.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        Optional[Tuple[int, datetime.datetime, str]]: The size in bytes, the modification time
+            (to the second, as sent in Last-Modified) and the ETag, or None if the file does not exist.
+    """
+    metadata = metadata_cache.lookup(path)
+    if metadata is not None:
+        return metadata
+
+    generation = metadata_cache.generation
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    metadata = (
+        stat.st_size,
+        datetime.datetime.fromtimestamp(int(stat.st_mtime), datetime.timezone.utc),
+        f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+    )
+    metadata_cache.fill(path, metadata, generation)
+    return metadata
+
+
+def get_ranges(size: int, etag: str, last_modified: datetime.datetime) -> Optional[List[Tuple[int, int]]]:
+    """
+    Gets the byte ranges requested in the Range header, following If-Range.
+
+    Args:
+        size (int): The size of the file.
+        etag (str): The file's ETag.
+        last_modified (datetime.datetime): The file's modification time.
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: None if the whole file should be sent, otherwise the
+            start and (exclusive) end of each satisfiable range, which may be empty.
+    """
+    # Malformed or overlapping ranges, and ranges in other units, are ignored.
+    requested = request.range
+    if requested is None or requested.units != 'bytes' or len(requested.ranges) > MAX_RANGES:
+        return None
+
+    # Sends the whole file if it has changed since the client's partial copy. Only a strong
+    # ETag or the exact modification time counts as unchanged.
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if if_range.startswith('"'):
+            if if_range != f'"{etag}"':
+                return None
+        elif parse_date(if_range) != last_modified:
+            return None
+
+    # Resolves suffix ranges (e.g. the last 500 bytes) and open-ended ranges against the size,
+    # dropping ranges that start past the end of the file.
+    ranges = []
+    for start, end in requested.ranges:
+        if start < 0:
+            start, end = max(0, size + start), size
+        end = size if end is None else min(end, size)
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+class MappedFile:
+    """
+    The body of a response containing parts of a file, read through a memory map so the file
+    is never read into Python buffers as a whole. The file is opened when the body is first
+    iterated and closed when the server closes the body.
+
+    Args:
+        path (str): The path of the file.
+        parts (List[Union[bytes, Tuple[int, int]]]): The parts of the body, each either bytes
+            (such as a multipart header) or the start and end of a range of the file.
+    """
+
+    def __init__(self, path: str, parts: List[Union[bytes, Tuple[int, int]]]):
+        self.path = path
+        self.parts = parts
+        self._file = None
+        self._map = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+
+            start, end = part
+            if start == end:
+                continue
+            if self._map is None:
+                self._file = open(self.path, 'rb')
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            for offset in range(start, end, CHUNK_SIZE):
+                yield self._map[offset:min(offset + CHUNK_SIZE, end)]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def file_body(path: str, start: int, end: int):
+    """
+    Gets the body of a response containing one range of a file. Under gunicorn the file is
+    handed to the server's `wsgi.file_wrapper`, which sends it with `os.sendfile` from the
+    current file position for Content-Length bytes, so the video never passes through Python.
+    Other servers send every byte from the file wrapper, so they get a `MappedFile` instead,
+    as do HEAD requests, whose body is never sent or closed.
+
+    Args:
+        path (str): The path of the file.
+        start (int): The first byte to send.
+        end (int): The byte after the last byte to send.
+
+    Returns:
+        The response body.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if (file_wrapper is not None and request.method != 'HEAD'
+            and request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')):
+        file = open(path, 'rb')
+        file.seek(start)
+        return file_wrapper(file, CHUNK_SIZE)
+    return MappedFile(path, [(start, end)])
+
+
+# ================
+# Media functions
+# ================
+@media.route('/<path:filename>')
+def video(filename: str):
+    """
+    Serves a video from app/static/img, answering byte-range requests (including multipart
+    and If-Range requests) and conditional requests.
+
+    Args:
+        filename (str): The path of the video, relative to app/static/img.
+
+    Returns:
+        Response: The whole video (200), the requested ranges (206), 304 Not Modified, or 416
+                  if none of the ranges are in the video.
+        404 error: If the file does not exist or is not a video.
+    """
+    media_type = MEDIA_TYPES.get(os.path.splitext(filename)[1].lower())
+    path = safe_join(os.path.join(current_app.static_folder, MEDIA_FOLDER), filename)
+    metadata = get_metadata(path) if media_type is not None and path is not None else None
+    if metadata is None:
+        abort(404)
+    size, last_modified, etag = metadata
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": f"public, max-age={MEDIA_MAX_AGE}",
+    }
+
+    # Answers with 304 if the client's copy is current.
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return Response(status=304, headers=headers)
+
+    ranges = get_ranges(size, etag, last_modified)
+
+    # Sends the whole video.
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return Response(file_body(path, 0, size), status=200, headers=headers,
+                        mimetype=media_type, direct_passthrough=True)
+
+    # None of the ranges are in the video.
+    if not ranges:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    # Sends a single range.
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return Response(file_body(path, start, end), status=206, headers=headers,
+                        mimetype=media_type, direct_passthrough=True)
+
+    # Sends several ranges as a multipart/byteranges body, each part with its own headers.
+    boundary = uuid.uuid4().hex
+    parts = []
+    for start, end in ranges:
+        parts.append(f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                     f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n".encode())
+        parts.append((start, end))
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+
+    headers["Content-Length"] = str(sum(len(part) if isinstance(part, bytes) else part[1] - part[0]
+                                        for part in parts))
+    return Response(MappedFile(path, parts), status=206, headers=headers,
+                    mimetype=f"multipart/byteranges; boundary={boundary}", direct_passthrough=True)
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+from flask import g, has_app_context, request
+from psycopg2.extensions import cursor as Cursor
+
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================
+# Query metrics
+# ===========================
+class InstrumentedCursor(Cursor):
+    """
+    A psycopg2 cursor that times every statement it executes and records it in the `metrics`
+    of the subclass created by `QueryMetrics`. Statements are recorded under the cursor's
+    `statement_name` (the SQL file name, set by `execute_script`), or "unnamed".
+    """
+    metrics: "QueryMetrics" = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statement_name = None
+
+    def execute(self, query, vars=None):
+        name = self.statement_name or "unnamed"
+
+        # Server-side PREPARE statements are recorded separately from executions.
+        if isinstance(query, str) and query.startswith('PREPARE '):
+            name += " (prepare)"
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            # Only statements that return rows (and whose row count is known) count rows.
+            rows = self.rowcount if self.description is not None and self.rowcount > 0 else 0
+            self.metrics.record(name, time.perf_counter() - start, rows, failed)
+
+
+def name_statement(cursor, name: str):
+    """
+    Sets the name the cursor's next statements are recorded under, if the cursor is instrumented.
+
+    Args:
+        cursor: A psycopg2 cursor.
+        name (str): The name to record the statements under, e.g. "wallets/get-wallet.sql".
+    """
+    if isinstance(cursor, InstrumentedCursor):
+        cursor.statement_name = name
+
+
+class QueryMetrics:
+    """
+    Records the count, latency and rows returned of each SQL statement and the number of
+    queries made by each request, and logs statements slower than `slow_query_threshold`.
+
+    Connections opened with `cursor_factory=metrics.cursor_factory` record every statement
+    their cursors execute. The counters cover this process only.
+
+    Args:
+        slow_query_threshold (float): Statements taking longer than this many seconds are
+                                      logged as warnings. 0 logs every statement.
+
+    Example:
+        >>> metrics = QueryMetrics(0.1)
+        >>> connection = psycopg2.connect(..., cursor_factory=metrics.cursor_factory)
+        >>> metrics.stats()["statements"]["wallets/get-wallet.sql"]["count"]
+        3
+    """
+
+    def __init__(self, slow_query_threshold: float):
+        self.slow_query_threshold = slow_query_threshold
+        self.cursor_factory = type("InstrumentedCursor", (InstrumentedCursor,), {"metrics": self})
+        self._lock = threading.Lock()
+
+        # The count, total seconds, maximum seconds, rows returned and errors of each statement.
+        self._statements: Dict[str, List[Union[int, float]]] = {}
+
+        # The number of requests, the queries they made and the most made by a single request.
+        self._requests = 0
+        self._request_queries = 0
+        self._max_request_queries = 0
+
+    def record(self, name: str, seconds: float, rows: int, failed: bool = False):
+        """
+        Records one execution of a statement.
+
+        Args:
+            name (str): The name of the statement.
+            seconds (float): How long the statement took.
+            rows (int): The number of rows the statement returned.
+            failed (bool, optional): Whether the statement raised an error. Defaults to False.
+        """
+        with self._lock:
+            statement = self._statements.setdefault(name, [0, 0.0, 0.0, 0, 0])
+            statement[0] += 1
+            statement[1] += seconds
+            statement[2] = max(statement[2], seconds)
+            statement[3] += rows
+            statement[4] += failed
+
+        # Counts the query against the current request, if there is one.
+        if has_app_context():
+            g.query_count = g.get('query_count', 0) + 1
+            g.query_time = g.get('query_time', 0.0) + seconds
+
+        if seconds >= self.slow_query_threshold:
+            logger.warning("Slow query: %s took %.1f ms and returned %d rows",
+                           name, seconds * 1000, rows)
+
+    def record_request(self):
+        """
+        Records the number of queries made by the current request. Called when the request ends.
+        """
+        queries = g.get('query_count', 0)
+        with self._lock:
+            self._requests += 1
+            self._request_queries += queries
+            self._max_request_queries = max(self._max_request_queries, queries)
+
+        if queries:
+            logger.debug("%s %s made %d queries taking %.1f ms", request.method, request.path,
+                         queries, g.get('query_time', 0.0) * 1000)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Gets the recorded counters.
+
+        Returns:
+            Dict[str, Dict]: A dictionary containing the following keys:
+                - "statements": For each statement name, its "count", "total_time",
+                  "max_time" (in seconds), "rows" and "errors".
+                - "requests": The number of "requests", the "queries" they made and
+                  "max_queries" made by a single request.
+        """
+        with self._lock:
+            return {
+                "statements": {
+                    name: {
+                        "count": count,
+                        "total_time": total_time,
+                        "max_time": max_time,
+                        "rows": rows,
+                        "errors": errors,
+                    }
+                    for name, (count, total_time, max_time, rows, errors) in self._statements.items()
+                },
+                "requests": {
+                    "requests": self._requests,
+                    "queries": self._request_queries,
+                    "max_queries": self._max_request_queries,
+                },
+            }
+
+
+# ===========================
+# Prometheus text format
+# ===========================
+def escape_label(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(metrics: Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]) -> str:
+    """
+    Renders metrics in the Prometheus text exposition format.
+
+    Args:
+        metrics (Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]): The name,
+            type ("counter" or "gauge"), help text and samples of each metric, where each sample
+            is its labels and value.
+
+    Returns:
+        str: The metrics in the Prometheus text format.
+
+    Example:
+        >>> prometheus_text([("db_pool_in_use", "gauge", "Connections checked out.", [({}, 2)])])
+        '# HELP db_pool_in_use Connections checked out.\\n# TYPE db_pool_in_use gauge\\ndb_pool_in_use 2\\n'
+    """
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape_label(str(label))}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,128 @@
+import re
+from typing import List, Tuple
+from . import statements
+from .metrics import name_statement
+
+
+# ===========================
+# Schema migrations
+# ===========================
+
+# Matches the name of a migration script, e.g. "migrations/0002-add-keys-and-indexes.sql".
+MIGRATION_PATTERN = re.compile(r'^migrations/(\d+)-([\w-]+)\.sql$')
+
+# An arbitrary key for the advisory lock that stops two processes migrating at once.
+MIGRATION_LOCK_KEY = 461720
+
+# Creates the table recording which migrations have been applied.
+CREATE_SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def get_migrations() -> List[Tuple[int, str, str]]:
+    """
+    Gets every migration script in app/sql/migrations/, in the order they are applied.
+
+    Migrations are named `<version>-<name>.sql`, where the version is a number that is one
+    higher than the previous migration's. Migrations are only ever added, never edited.
+
+    Returns:
+        List[Tuple[int, str, str]]: The version, name and path of each migration.
+
+    Raises:
+        ValueError: Two migrations have the same version.
+
+    Example:
+        >>> get_migrations()[0]
+        (1, 'create-tables', 'migrations/0001-create-tables.sql')
+    """
+    if not statements.statements:
+        statements.load_statements()
+
+    migrations = []
+    for path in statements.statements:
+        match = MIGRATION_PATTERN.match(path)
+        if match is not None:
+            migrations.append((int(match.group(1)), match.group(2), path))
+    migrations.sort()
+
+    # Two migrations with the same version would be applied in an arbitrary order.
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Two migrations have the same version")
+
+    return migrations
+
+
+def get_schema_version(cursor) -> int:
+    """
+    Gets the version of the most recent migration applied to the database.
+
+    Args:
+        cursor: A psycopg2 cursor.
+
+    Returns:
+        int: The schema version, or 0 if no migrations have been applied.
+    """
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(connection) -> List[int]:
+    """
+    Applies every migration newer than the database's schema version, in order. Each migration
+    is applied and recorded in the `schema_version` table in its own transaction, so a failed
+    migration leaves the database at the previous version.
+
+    Args:
+        connection: A psycopg2 connection, with no transaction in progress.
+
+    Returns:
+        List[int]: The versions of the migrations that were applied.
+
+    Raises:
+        psycopg2.Error: A migration failed, or the database could not be reached.
+
+    Example:
+        >>> migrate(connection)
+        [1, 2]
+    """
+    applied = []
+    cursor = connection.cursor()
+    name_statement(cursor, "migrations")
+
+    # Waits for any other process that is migrating the database to finish.
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        cursor.execute(CREATE_SCHEMA_VERSION_TABLE)
+        connection.commit()
+        current_version = get_schema_version(cursor)
+
+        for version, name, path in get_migrations():
+            if version <= current_version:
+                continue
+
+            # Applies the migration and records it together, so they succeed or fail as one.
+            try:
+                name_statement(cursor, path)
+                cursor.execute(statements.get_statement(path))
+                name_statement(cursor, "migrations")
+                cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                               (version, name))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            applied.append(version)
+
+    finally:
+        connection.rollback()
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        connection.commit()
+
+    return applied
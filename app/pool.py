@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Union
+from psycopg2 import pool
+
+
+# ========================
+# Connection pool classes
+# ========================
+class PoolTimeout(Exception):
+    """
+    Raised when no connection becomes available within the pool's timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of PostgreSQL connections built on psycopg2's `ThreadedConnectionPool`.
+
+    psycopg2's pool raises as soon as every connection is checked out, so checkouts are gated
+    by a semaphore instead, letting a request wait (up to `timeout` seconds) for a connection
+    to be returned. The underlying psycopg2 pool is created lazily in the process that first
+    uses it, so a pool configured before gunicorn forks is never shared between workers.
+
+    Args:
+        minconn (int): The number of connections opened when the pool is created.
+        maxconn (int): The maximum number of connections the pool will open.
+        timeout (float): How long (in seconds) a checkout waits for a free connection.
+        **connect_kwargs: The arguments passed to `psycopg2.connect`.
+
+    Example:
+        >>> connection_pool = ConnectionPool(1, 4, 5.0, dbname="blackjack")
+        >>> with connection_pool.connection() as connection:
+        ...     connection.cursor().execute("SELECT 1")
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+
+        # The process the pool was created in and the psycopg2 pool itself.
+        self._pid = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(maxconn)
+
+        # Counters used to size the pool.
+        self._checkouts = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_pool(self) -> pool.ThreadedConnectionPool:
+        """
+        Gets the psycopg2 pool for the current process, creating it after a fork.
+
+        Returns:
+            pool.ThreadedConnectionPool: The psycopg2 pool owned by this process.
+        """
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Connections inherited from a parent process belong to the parent, so they
+                    # are dropped rather than closed and a fresh pool is opened for this process.
+                    self._pool = pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, **self.connect_kwargs)
+                    self._semaphore = threading.BoundedSemaphore(self.maxconn)
+                    self._in_use = 0
+                    self._pid = pid
+        return self._pool
+
+    def open(self):
+        """
+        Opens this process's pool now rather than on the first checkout, e.g. in a gunicorn
+        worker straight after it forks.
+
+        Raises:
+            psycopg2.Error: An error occurred when connecting to the database.
+        """
+        self._get_pool()
+
+    def getconn(self):
+        """
+        Checks out a connection, waiting for one to be returned if the pool is exhausted.
+
+        Returns:
+            connection: A psycopg2 connection.
+
+        Raises:
+            PoolTimeout: No connection became available within the pool's timeout.
+            psycopg2.Error: An error occurred when connecting to the database.
+        """
+        connection_pool = self._get_pool()
+
+        # Waits for a free slot and records how long the wait was.
+        start = time.perf_counter()
+        acquired = self._semaphore.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            if not acquired:
+                self._timeouts += 1
+
+        if not acquired:
+            raise PoolTimeout(
+                f"No database connection became available within {self.timeout} seconds.")
+
+        try:
+            connection = connection_pool.getconn()
+        except Exception:
+            self._semaphore.release()
+            raise
+
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+
+        return connection
+
+    def putconn(self, connection, close: bool = False):
+        """
+        Returns a connection to the pool. Broken connections are closed rather than reused.
+
+        Args:
+            connection: The psycopg2 connection to return.
+            close (bool, optional): If True, close the connection instead of reusing it. Defaults to False.
+        """
+        # Connections checked out before a fork are not returned to the child's pool.
+        if self._pid != os.getpid():
+            return
+
+        # Discards connections that have been closed or lost contact with the server.
+        close = close or connection.closed != 0
+        try:
+            self._pool.putconn(connection, close=close)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                if close:
+                    self._discarded += 1
+            self._semaphore.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the duration of a `with` block.
+
+        Yields:
+            connection: A psycopg2 connection, returned to the pool when the block exits.
+        """
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def closeall(self):
+        """
+        Closes every connection owned by this process's pool.
+        """
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._pid = None
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the pool's counters for sizing it against the number of workers.
+
+        Returns:
+            Dict[str, Union[int, float]]: A dictionary containing the following keys:
+                - "min_size" (int): The number of connections opened when the pool is created.
+                - "max_size" (int): The maximum number of connections the pool will open.
+                - "in_use" (int): The number of connections currently checked out.
+                - "checkouts" (int): The total number of successful checkouts.
+                - "timeouts" (int): The number of checkouts that gave up waiting.
+                - "discarded" (int): The number of broken connections that were closed.
+                - "total_wait" (float): The total time (in seconds) spent waiting for a connection.
+                - "max_wait" (float): The longest time (in seconds) spent waiting for a connection.
+
+        Example:
+            >>> connection_pool.stats()
+            {"min_size": 1, "max_size": 4, "in_use": 0, "checkouts": 12, ...}
+        """
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "total_wait": self._total_wait,
+                "max_wait": self._max_wait,
+            }
@@ -0,0 +1,131 @@
+import functools
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Tuple
+from flask import Response, current_app, make_response, request, session
+
+
+# ===========================
+# Rendered response cache
+# ===========================
+
+# Whether pages decorated with `response_cache.cached` are rendered once and reused.
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'true').lower() == 'true'
+
+
+class ResponseCache:
+    """
+    Keeps the rendered body of pages that are the same for every visitor, so each page is
+    rendered once per process instead of on every request.
+
+    Each page is stored with a strong ETag (a hash of its body), so a browser or crawler that
+    already has the page is answered with an empty 304 Not Modified response. The cache is
+    keyed by path and is cleared on every deploy, since it only lives as long as the process.
+
+    Pages are rendered as normal, and nothing is cached, when the application is in debug
+    mode (so template changes show up straight away) or when the session has flashed
+    messages waiting, which the templates render and remove.
+
+    Args:
+        enabled (bool): Whether pages are cached.
+
+    Example:
+        >>> response_cache = ResponseCache(True)
+        >>> @views.route('/about')
+        ... @response_cache.cached
+        ... def about():
+        ...     return render_template('menu/about.html')
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+
+        # The body, content type and ETag of each cached page, keyed by path.
+        self._entries: Dict[str, Tuple[bytes, str, str]] = {}
+        self._lock = threading.Lock()
+
+        # Counters used to check the cache is being used.
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    def cached(self, view: Callable) -> Callable:
+        """
+        Decorates a view whose response is the same for every request to its path.
+
+        Args:
+            view (Callable): The view function.
+
+        Returns:
+            Callable: The decorated view function.
+        """
+        @functools.wraps(view)
+        def decorated_view(*args, **kwargs):
+            # Renders the page as normal if it cannot be cached right now.
+            if not self.enabled or current_app.debug or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            entry = self._entries.get(request.path)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+
+                # Only complete, successful pages are cached.
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+
+                body = response.get_data()
+                entry = (body, response.content_type, hashlib.sha256(body).hexdigest())
+                with self._lock:
+                    self._entries[request.path] = entry
+                    self._misses += 1
+            else:
+                with self._lock:
+                    self._hits += 1
+
+            # Builds the response from the cached page, answering with 304 if the client's copy
+            # has the same ETag. Clients revalidate the page each time it is shown.
+            body, content_type, etag = entry
+            response = Response(body, content_type=content_type)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            response = response.make_conditional(request)
+
+            if response.status_code == 304:
+                with self._lock:
+                    self._not_modified += 1
+            return response
+
+        return decorated_view
+
+    def clear(self):
+        """
+        Removes every cached page, e.g. after the templates have changed.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Gets the cache's counters.
+
+        Returns:
+            Dict[str, int]: A dictionary containing the following keys:
+                - "entries" (int): The number of pages cached.
+                - "bytes" (int): The total size of the cached pages.
+                - "hits" (int): The number of requests served from the cache.
+                - "misses" (int): The number of requests that rendered the page.
+                - "not_modified" (int): The number of requests answered with 304 Not Modified.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(len(body) for body, _, _ in self._entries.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "not_modified": self._not_modified,
+            }
+
+
+# The response cache shared by the views of this process.
+response_cache = ResponseCache(RESPONSE_CACHE)
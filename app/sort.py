@@ -1,3 +1,18 @@
+import heapq
+from typing import Optional, Sequence
+
+
+# The order of the values in categorical columns, keyed by column index. The table stakes
+# column is text, so it is sorted by stakes rather than alphabetically.
+CATEGORICAL_ORDERS = {
+    5: ['Low', 'Medium', 'High']
+}
+
+# Partial selection is used when the rows requested make up at most 1/SELECT_RATIO of the
+# rows; beyond that a full sort (which runs entirely in C) is faster.
+SELECT_RATIO = 16
+
+
 def merge(leftArray: list, rightArray: list) -> list:
     """
     Merge two sorted arrays into a single sorted array.
@@ -63,17 +78,226 @@ def merge_sort(array: list) -> list:
     return merge(leftArray, rightArray)
 
 
-def sort_rows(rows: list[list], column: int, reverse: bool = False):
+def find_runs(array: list) -> list[int]:
+    """
+    Splits an array into its naturally sorted runs, reversing strictly descending runs in place
+    so that every run is ascending. Strictly descending runs are reversed (rather than
+    non-increasing ones) so equal elements never change order.
+
+    Args:
+        array (list): The array to split into runs. Descending runs are reversed in place.
+
+    Returns:
+        list[int]: The boundaries of the runs, starting with 0 and ending with the array's length.
+
+    Example:
+        >>> array = [1, 2, 5, 4, 3, 6]
+        >>> find_runs(array)
+        [0, 3, 5, 6]
+        >>> array
+        [1, 2, 5, 3, 4, 6]
+    """
+    boundaries = [0]
+    length = len(array)
+    start = 0
+
+    while start < length:
+        end = start + 1
+
+        if end < length and array[end] < array[start]:
+            # Extend the strictly descending run, then reverse it in place.
+            while end < length and array[end] < array[end - 1]:
+                end += 1
+            i, j = start, end - 1
+            while i < j:
+                array[i], array[j] = array[j], array[i]
+                i += 1
+                j -= 1
+        else:
+            # Extend the ascending (non-decreasing) run.
+            while end < length and not array[end] < array[end - 1]:
+                end += 1
+
+        boundaries.append(end)
+        start = end
+
+    return boundaries
+
+
+def merge_runs(source: list, target: list, start: int, middle: int, end: int):
+    """
+    Merges the sorted runs source[start:middle] and source[middle:end] into target[start:end].
+    Equal elements are taken from the left run first, so the merge is stable.
+
+    Args:
+        source (list): The array containing the two runs.
+        target (list): The array to write the merged run into.
+        start (int): The index of the first element of the left run.
+        middle (int): The index of the first element of the right run.
+        end (int): The index after the last element of the right run.
+
+    Example:
+        >>> target = [None] * 6
+        >>> merge_runs([1, 4, 6, 2, 3, 5], target, 0, 3, 6)
+        >>> target
+        [1, 2, 3, 4, 5, 6]
+    """
+    i, j, k = start, middle, start
+
+    # Merge the two runs while maintaining the sorted order.
+    while i < middle and j < end:
+        if source[j] < source[i]:
+            target[k] = source[j]
+            j += 1
+        else:
+            target[k] = source[i]
+            i += 1
+        k += 1
+
+    # Copy the remaining elements of whichever run is left.
+    while i < middle:
+        target[k] = source[i]
+        i += 1
+        k += 1
+    while j < end:
+        target[k] = source[j]
+        j += 1
+        k += 1
+
+
+def bottom_up_merge_sort(array: list) -> list:
+    """
+    Sorts an array using an iterative (bottom-up) natural merge sort.
+
+    The array's already sorted runs are found first, then neighbouring runs are merged in
+    passes, alternating between the copy of the array and a single auxiliary buffer. Unlike
+    `merge_sort` this does not recurse or slice, and an array that is already (or almost)
+    sorted in either direction is sorted in close to linear time.
+
+    Args:
+        array (list): The array to be sorted. It is not modified.
+
+    Returns:
+        list: The sorted array.
+
+    Example:
+        >>> bottom_up_merge_sort([10, 7, 6, 7, 2, 2, 3, 0])
+        [0, 2, 2, 3, 6, 7, 7, 10]
+    """
+    # Copy the array so the original is not modified, and find its sorted runs.
+    source = list(array)
+    boundaries = find_runs(source)
+
+    # Base case: If there is only one run, the array is already sorted.
+    if len(boundaries) <= 2:
+        return source
+
+    # Merge neighbouring runs until only one run remains.
+    target = [None] * len(source)
+    while len(boundaries) > 2:
+        merged = [0]
+
+        for i in range(0, len(boundaries) - 2, 2):
+            start, middle, end = boundaries[i], boundaries[i + 1], boundaries[i + 2]
+
+            # Runs that are already in order are copied rather than merged.
+            if not source[middle] < source[middle - 1]:
+                target[start:end] = source[start:end]
+            else:
+                merge_runs(source, target, start, middle, end)
+            merged.append(end)
+
+        # Copy the last run if it has no neighbour to merge with in this pass.
+        if len(boundaries) % 2 == 0:
+            start, end = boundaries[-2], boundaries[-1]
+            target[start:end] = source[start:end]
+            merged.append(end)
+
+        boundaries = merged
+        source, target = target, source
+
+    # Return the sorted array.
+    return source
+
+
+def row_keys(rows: list[list], column: int) -> list:
+    """
+    Computes the sort key of each row for the given column. Categorical columns (such as the
+    game table) are mapped to their position in `CATEGORICAL_ORDERS`, and every other column
+    is sorted by its value.
+
+    Args:
+        rows (list): List of rows, where each row is a list.
+        column (int): The index of the column to sort by.
+
+    Returns:
+        list: The sort key of each row, in the same order as the rows.
+
+    Example:
+        >>> row_keys([[17-03-2024, 20:08, 3, 400, 133, High],
+                      [15-03-2024, 17:18, 6, 300, 50, Low]], 5)
+        [2, 0]
+    """
+    # Extract the data from the specified column
+    data = [row[column] for row in rows]
+
+    # Map categorical values to their position in the custom order, placing unknown values last.
+    sort_order = CATEGORICAL_ORDERS.get(column)
+    if sort_order is not None:
+        ordinals = {item: position for position, item in enumerate(sort_order)}
+        return [ordinals.get(element, len(sort_order)) for element in data]
+
+    return data
+
+
+def sort_indices(keys: list, reverse: bool = False, buckets: int = None) -> list[int]:
+    """
+    Sorts the positions of the given keys in a single stable sort. Rows with equal keys keep
+    their original order in both ascending and descending order.
+
+    Args:
+        keys (list): The sort key of each row.
+        reverse (bool, optional): If True, sort in descending order. Defaults to False.
+        buckets (int, optional): If the keys are integers in the range [0, buckets), they are
+                                 distributed into buckets in linear time instead of being
+                                 compared. Defaults to None.
+
+    Returns:
+        list[int]: The indices of the rows in sorted order.
+
+    Example:
+        >>> sort_indices([3, 1, 2, 1])
+        [1, 3, 2, 0]
+        >>> sort_indices([2, 0, 1, 0], True, buckets=3)
+        [0, 2, 1, 3]
+    """
+    # Sort small integer keys (such as categorical ordinals) with a stable counting sort.
+    if buckets is not None:
+        distributed = [[] for _ in range(buckets)]
+        for index, key in enumerate(keys):
+            distributed[key].append(index)
+        if reverse:
+            distributed.reverse()
+        return [index for bucket in distributed for index in bucket]
+
+    return sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+
+
+def sort_rows(rows: list[list], column: int, reverse: bool = False) -> list[list]:
     """
     Sorts a list of rows based on a specific column in ascending or descending order.
 
+    The key of each row is computed once and the row indices are sorted in a single stable
+    sort, so sorting takes O(n log n) time however many rows share a value (and O(n) time for
+    categorical columns).
+
     Args:
         rows (list): List of rows, where each row is a list.
         column (int): The index of the column to sort by.
         reverse (bool, optional): If True, sort in descending order. Defaults to False.
 
     Returns:
-        list: The sorted list of rows.
+        list: The rows in sorted order.
 
     Example:
         >>> data = [[17-03-2024, 20:08, 3, 400, 133, Medium],
@@ -82,46 +306,75 @@ def sort_rows(rows: list[list], column: int, reverse: bool = False):
         [[15-03-2024, 17:18, 6, 300, 50, Medium],
          [17-03-2024, 20:08, 3, 400, 133, Medium]]
     """
+    # Categorical keys are bucketed, with an extra bucket for values missing from the custom order.
+    sort_order = CATEGORICAL_ORDERS.get(column)
+    buckets = len(sort_order) + 1 if sort_order is not None else None
+    return [rows[i] for i in sort_indices(row_keys(rows, column), reverse, buckets=buckets)]
 
-    # Extract the data from the specified column
-    data = [row[column] for row in rows]
 
-    # Sort the table stakes column separately to the other columns since it is text.
-    if column == 5:
-        # Define your custom list with the desired order.
-        sort_order = ['Low', 'Medium', 'High']
-
-        # Initialize an empty list to store the sorted elements.
-        sorted_data = []
-
-        # Iterate through the sort_order and append elements from the original list
-        # in the order defined by the custom list.
-        for item in sort_order:
-            for element in data:
-                if element == item:
-                    sorted_data.append(element)
-    # Sort the rest of the columns using the `merge_sort` function.
-    else:
-        # Sort the data using merge sort.
-        sorted_data = merge_sort(data)
+def select_indices(keys: list, offset: int, limit: int, reverse: bool = False,
+                   indices: Optional[Sequence[int]] = None) -> list[int]:
+    """
+    Gets the indices of the rows in positions [offset, offset + limit) of the sorted order,
+    without sorting every row. The first offset + limit rows are selected with a heap in
+    O(n log k) time, which is much faster than a full sort when only an early page is shown.
+
+    Args:
+        keys (list): The sort key of each row.
+        offset (int): The position of the first row to return.
+        limit (int): The number of rows to return.
+        reverse (bool, optional): If True, sort in descending order. Defaults to False.
+        indices (Optional[Sequence[int]], optional): The indices to select from, in the order
+                                                     rows with equal keys should appear in.
+                                                     Defaults to every index in ascending order.
+
+    Returns:
+        list[int]: The indices of the selected rows in sorted order, the same as
+                   `sort_indices(keys, reverse)[offset:offset + limit]` with the default `indices`.
+
+    Example:
+        >>> select_indices([3, 1, 2, 1, 5, 4], 1, 2)
+        [3, 2]
+    """
+    if indices is None:
+        indices = range(len(keys))
+    selected = offset + limit
 
-    # Reverse the sorted data if reverse is True.
+    # Falls back to a full sort when most of the rows are needed anyway.
+    if selected * SELECT_RATIO > len(keys):
+        order = sorted(indices, key=keys.__getitem__, reverse=reverse)
+        return order[offset:selected]
+
+    # Both heap functions keep rows with equal keys in the order of `indices`.
     if reverse:
-        sorted_data.reverse()
+        order = heapq.nlargest(selected, indices, key=keys.__getitem__)
+    else:
+        order = heapq.nsmallest(selected, indices, key=keys.__getitem__)
+    return order[offset:]
 
-    # Initialises a variable to append the sorted rows to.
-    sorted_rows = []
 
-    # Create a copy of the rows using list comprehension to avoid mutation.
-    rows_copy = [row[:] for row in rows]
 
-    # Sort the rows based on the sorted data.
-    for value in sorted_data:
-        for row in rows_copy:
-            if row[column] == value:
-                sorted_rows.append(row)
-                # Remove the row from the copy to avoid duplicates.
-                rows_copy.remove(row)
+def select_rows(rows: list[list], column: int, offset: int, limit: int, reverse: bool = False) -> list[list]:
+    """
+    Gets the rows in positions [offset, offset + limit) of the rows sorted by the given column,
+    in the same order as `sort_rows`, without sorting every row.
 
-    # Return the sorted rows
-    return sorted_rows
+    Args:
+        rows (list): List of rows, where each row is a list.
+        column (int): The index of the column to sort by.
+        offset (int): The position of the first row to return.
+        limit (int): The number of rows to return.
+        reverse (bool, optional): If True, sort in descending order. Defaults to False.
+
+    Returns:
+        list: The selected rows in sorted order, the same as
+              `sort_rows(rows, column, reverse)[offset:offset + limit]`.
+
+    Example:
+        >>> data = [[17-03-2024, 20:08, 3, 400, 133, Medium],
+                    [15-03-2024, 17:18, 6, 300, 50, Medium],
+                    [16-03-2024, 12:00, 1, -20, -20, Low]]
+        >>> select_rows(data, 2, 0, 1, True)
+        [[15-03-2024, 17:18, 6, 300, 50, Medium]]
+    """
+    return [rows[i] for i in select_indices(row_keys(rows, column), offset, limit, reverse)]
@@ -0,0 +1,5 @@
+-- Selects the password hash, salt and account information, including the wallet, for the given username.
+SELECT a.password, a.salt, a.user_id, a.sign_up_date, w.wallet
+FROM accounts a
+LEFT JOIN wallets w ON w.user_id = a.user_id
+WHERE a.username = %s
\ No newline at end of file
@@ -1,4 +1,5 @@
--- Selects the user_id and sign_up_date for the given username.
-SELECT user_id, sign_up_date
-FROM accounts
-WHERE username = %s
\ No newline at end of file
+-- Selects the user_id, sign_up_date and wallet for the given username.
+SELECT a.user_id, a.sign_up_date, w.wallet
+FROM accounts a
+LEFT JOIN wallets w ON w.user_id = a.user_id
+WHERE a.username = %s
\ No newline at end of file
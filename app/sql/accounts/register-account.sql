@@ -1,3 +1,17 @@
--- Adds the user to the accounts table.
-INSERT INTO accounts (username, password, salt, sign_up_date)
-VALUES (%s, %s, %s, CURRENT_DATE);
\ No newline at end of file
+-- Adds the user to the accounts table and creates their wallet, starting at 100, in one statement.
+-- If the username is already registered the UNIQUE constraint skips the insert and no row is returned.
+WITH new_account AS (
+  INSERT INTO accounts (username, password, salt, sign_up_date)
+  VALUES (%s, %s, %s, CURRENT_DATE)
+  ON CONFLICT (username) DO NOTHING
+  RETURNING user_id, sign_up_date
+),
+new_wallet AS (
+  INSERT INTO wallets (user_id, wallet)
+  SELECT user_id, 100
+  FROM new_account
+  RETURNING user_id, wallet
+)
+SELECT new_account.user_id, new_account.sign_up_date, new_wallet.wallet
+FROM new_account
+JOIN new_wallet ON new_wallet.user_id = new_account.user_id;
@@ -0,0 +1,4 @@
+-- Replaces the password hash and salt for the given username.
+UPDATE accounts
+SET password = %s, salt = %s
+WHERE username = %s
\ No newline at end of file
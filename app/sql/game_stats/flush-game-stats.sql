@@ -0,0 +1,9 @@
+-- Adds the buffered hands and profit/loss of each game to its stats.
+UPDATE game_stats gs
+SET number_of_hands = gs.number_of_hands + pending.hands,
+    net_profit_loss = gs.net_profit_loss + pending.profit_loss,
+    average_profit_loss = FLOOR(
+        (gs.net_profit_loss + pending.profit_loss)::NUMERIC / (gs.number_of_hands + pending.hands)
+    )
+FROM (VALUES %s) AS pending (game_id, hands, profit_loss)
+WHERE gs.game_id = pending.game_id;
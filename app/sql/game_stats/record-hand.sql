@@ -0,0 +1,54 @@
+-- Records a hand in a single statement. If no `game_id` is given, a new game and its stats
+-- are created; otherwise the hand is added to the stats of the player's game. The player's
+-- wallet is updated in the same statement, and the new stats and wallet are returned. No row
+-- is returned (and nothing is written) if the given game does not exist or belongs to another
+-- user; the wallet is NULL if the user has no wallet.
+WITH new_game AS (
+    INSERT INTO games (user_id, date_of_game, time_of_game, game_table)
+    SELECT %(user_id)s::INTEGER, CURRENT_DATE, CURRENT_TIME, %(game_table)s::TEXT
+    WHERE %(game_id)s::INTEGER IS NULL
+    RETURNING game_id
+),
+new_stats AS (
+    INSERT INTO game_stats (
+            game_id,
+            number_of_hands,
+            net_profit_loss,
+            average_profit_loss
+        )
+    SELECT game_id, 1, %(profit_loss)s::INTEGER, %(profit_loss)s::INTEGER
+    FROM new_game
+    RETURNING game_id, number_of_hands, net_profit_loss, average_profit_loss
+),
+updated_stats AS (
+    UPDATE game_stats gs
+    SET number_of_hands = gs.number_of_hands + 1,
+        net_profit_loss = gs.net_profit_loss + %(profit_loss)s::INTEGER,
+        average_profit_loss = FLOOR(
+            (gs.net_profit_loss + %(profit_loss)s::INTEGER)::NUMERIC / (gs.number_of_hands + 1)
+        )
+    FROM games g
+    WHERE gs.game_id = %(game_id)s::INTEGER
+        AND g.game_id = gs.game_id
+        AND g.user_id = %(user_id)s::INTEGER
+    RETURNING gs.game_id, gs.number_of_hands, gs.net_profit_loss, gs.average_profit_loss
+),
+stats AS (
+    SELECT * FROM new_stats
+    UNION ALL
+    SELECT * FROM updated_stats
+),
+updated_wallet AS (
+    UPDATE wallets
+    SET wallet = %(wallet)s::INTEGER
+    WHERE user_id = %(user_id)s::INTEGER
+        AND EXISTS (SELECT 1 FROM stats)
+    RETURNING wallet
+)
+SELECT stats.game_id,
+    stats.number_of_hands,
+    stats.net_profit_loss,
+    stats.average_profit_loss,
+    updated_wallet.wallet
+FROM stats
+LEFT JOIN updated_wallet ON TRUE;
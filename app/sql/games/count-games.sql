@@ -0,0 +1,5 @@
+-- Returns a count of the number of games the given user has played.
+SELECT COUNT(*)
+FROM games g
+JOIN game_stats gs ON g.game_id = gs.game_id
+WHERE g.user_id = %s;
@@ -0,0 +1,11 @@
+-- Selects every game of the given user, with its stats, in the order the games were played.
+SELECT g.date_of_game,
+    g.time_of_game,
+    gs.number_of_hands,
+    gs.net_profit_loss,
+    gs.average_profit_loss,
+    g.game_table
+FROM games g
+JOIN game_stats gs ON g.game_id = gs.game_id
+WHERE g.user_id = %s
+ORDER BY g.date_of_game, g.time_of_game, g.game_id
\ No newline at end of file
@@ -1,5 +1,18 @@
--- Selects the game information from the `games` and `game_stats` tables and joins them together through the `game_id`.
-SELECT g.date_of_game, g.time_of_game, gs.number_of_hands, gs.net_profit_loss, gs.average_profit_loss, g.game_table
+-- Selects a page of the user's games from the `games` and `game_stats` tables, joined through the `game_id`.
+-- The sort key and direction are filled in by `get_games_page` from a whitelist of columns, and the
+-- seek condition resumes from the edge of the previous page (keyset pagination) rather than skipping
+-- rows with OFFSET. The `game_id` breaks ties so every row has a unique position in the order.
+SELECT g.date_of_game,
+    g.time_of_game,
+    gs.number_of_hands,
+    gs.net_profit_loss,
+    gs.average_profit_loss,
+    g.game_table,
+    {sort_key} AS sort_key,
+    g.game_id
 FROM games g
 JOIN game_stats gs ON g.game_id = gs.game_id
-WHERE g.user_id = %s;
\ No newline at end of file
+WHERE g.user_id = %s
+    AND {seek}
+ORDER BY {sort_key} {direction}, g.game_id {direction}
+LIMIT %s;
@@ -0,0 +1,19 @@
+-- Adds the missing primary keys and the indexes used to look up each user's games,
+-- wallet and game stats, so those lookups no longer scan the whole table.
+
+-- games.user_id references an account, so it should not draw its own values from a sequence.
+ALTER TABLE games ALTER COLUMN user_id DROP DEFAULT;
+DROP SEQUENCE IF EXISTS games_user_id_seq;
+
+-- Each user has exactly one wallet, looked up by user_id.
+ALTER TABLE wallets ALTER COLUMN user_id SET NOT NULL;
+ALTER TABLE wallets ADD PRIMARY KEY (user_id);
+
+-- Each game has exactly one row of game stats, looked up by game_id.
+ALTER TABLE game_stats ALTER COLUMN game_id SET NOT NULL;
+ALTER TABLE game_stats ADD PRIMARY KEY (game_id);
+
+-- Finds a user's games in date and time order. Also serves as the index for the
+-- games.user_id foreign key.
+CREATE INDEX IF NOT EXISTS games_user_id_date_time_idx
+    ON games (user_id, date_of_game, time_of_game);
@@ -0,0 +1,5 @@
+-- Sets the buffered wallet value for each user.
+UPDATE wallets w
+SET wallet = pending.wallet
+FROM (VALUES %s) AS pending (user_id, wallet)
+WHERE w.user_id = pending.user_id;
@@ -1,4 +1,4 @@
--- Updates the wallet value for the given `username`.
+-- Updates the wallet value for the given `user_id`.
 UPDATE wallets
 SET wallet = %s
 WHERE user_id = %s;
\ No newline at end of file
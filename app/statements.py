@@ -0,0 +1,194 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from psycopg2.extensions import connection as Connection
+
+
+# ===========================
+# SQL statement registry
+# ===========================
+
+# The directory containing every SQL script used by the application.
+SQL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+
+# Matches psycopg2 placeholders: named (`%(name)s`), positional (`%s`) and escaped percent signs (`%%`).
+PLACEHOLDER_PATTERN = re.compile(r'%\((\w+)\)s|%s|%%')
+
+# The SQL scripts, keyed by their path relative to the SQL directory (e.g. "wallets/get-wallet.sql").
+statements: Dict[str, str] = {}
+
+# The server-side form of each preparable script, keyed in the same way as `statements`.
+prepared_statements: Dict[str, Tuple[str, str]] = {}
+
+
+class PreparingConnection(Connection):
+    """
+    A psycopg2 connection that remembers which statements have been prepared on it, so each
+    statement is only sent to the server with PREPARE once per connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def load_statements(directory: str = SQL_DIRECTORY) -> Dict[str, str]:
+    """
+    Reads every SQL script under the given directory into the registry.
+
+    Args:
+        directory (str, optional): The directory to load the SQL scripts from. Defaults to app/sql/.
+
+    Returns:
+        Dict[str, str]: The SQL scripts, keyed by their path relative to the directory.
+
+    Example:
+        >>> load_statements()["wallets/get-wallet.sql"]
+        '-- Selects the wallet for the given user_id.\\nSELECT wallet ...'
+    """
+    loaded = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if not filename.endswith('.sql'):
+                continue
+
+            # Names use forward slashes on every platform, matching the names used in app/db.py.
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            with open(path, 'r') as sql_file:
+                loaded[name] = sql_file.read()
+
+    # Builds the server-side form of every script that can be prepared.
+    prepared = {}
+    for name, script in loaded.items():
+        statement = build_prepared_statement(name, script)
+        if statement is not None:
+            prepared[name] = statement
+
+    # Replaces the contents of the registry.
+    statements.clear()
+    statements.update(loaded)
+    prepared_statements.clear()
+    prepared_statements.update(prepared)
+
+    return statements
+
+
+def get_statement(name: str) -> str:
+    """
+    Gets the cached text of the given SQL script, loading the registry if it is empty.
+
+    Args:
+        name (str): The path of the SQL script relative to app/sql/.
+
+    Returns:
+        str: The SQL script as a string.
+
+    Raises:
+        KeyError: There is no SQL script with the given name.
+
+    Example:
+        >>> get_statement("wallets/get-wallet.sql")
+        '-- Selects the wallet for the given user_id.\\nSELECT wallet ...'
+    """
+    if not statements:
+        load_statements()
+    return statements[name]
+
+
+def build_prepared_statement(name: str, script: str) -> Optional[Tuple[str, str]]:
+    """
+    Converts a SQL script into a PREPARE statement and the matching EXECUTE statement.
+
+    Only scripts containing a single statement can be prepared. The script's psycopg2
+    placeholders become numbered server-side parameters in the PREPARE statement, and
+    are moved into the EXECUTE statement so the same parameters can be passed to it.
+
+    Args:
+        name (str): The path of the SQL script relative to app/sql/.
+        script (str): The SQL script.
+
+    Returns:
+        Optional[Tuple[str, str]]: The PREPARE and EXECUTE statements, or None if the script
+                                   cannot be prepared.
+
+    Example:
+        >>> build_prepared_statement("wallets/get-wallet.sql",
+        ...                          "SELECT wallet FROM wallets WHERE user_id = %s")
+        ('PREPARE wallets_get_wallet AS SELECT wallet FROM wallets WHERE user_id = $1',
+         'EXECUTE wallets_get_wallet (%s)')
+    """
+    # Removes comments and the trailing semicolon, leaving only the statement itself.
+    lines = [line for line in script.splitlines() if not line.strip().startswith('--')]
+    body = '\n'.join(lines).strip().rstrip(';').strip()
+
+    # Scripts with several statements (e.g. migrations) are executed as they are, and scripts
+    # that are completed with `psycopg2.sql` (marked by `{...}` fields) cannot be prepared ahead.
+    if not body or ';' in body or '{' in body:
+        return None
+
+    # Numbers each placeholder, reusing the same number for repeated named placeholders.
+    placeholders: List[str] = []
+    named: Dict[str, int] = {}
+
+    def number_placeholder(match: re.Match) -> str:
+        if match.group(0) == '%%':
+            return '%'
+        if match.group(1) is None:
+            placeholders.append('%s')
+            return f'${len(placeholders)}'
+        if match.group(1) not in named:
+            placeholders.append(match.group(0))
+            named[match.group(1)] = len(placeholders)
+        return f'${named[match.group(1)]}'
+
+    body = PLACEHOLDER_PATTERN.sub(number_placeholder, body)
+
+    # A script cannot mix named and positional placeholders.
+    if named and len(named) != len(placeholders):
+        return None
+
+    # Names are derived from the script path (e.g. "wallets/get-wallet.sql" -> "wallets_get_wallet").
+    statement_name = re.sub(r'\W', '_', name[:-len('.sql')])
+    prepare = f'PREPARE {statement_name} AS {body}'
+    execute = f'EXECUTE {statement_name}'
+    if placeholders:
+        execute += f' ({", ".join(placeholders)})'
+
+    return prepare, execute
+
+
+def execute_prepared(cursor, name: str, params=None) -> bool:
+    """
+    Executes the given SQL script as a server-side prepared statement, preparing it on the
+    cursor's connection the first time it is used there.
+
+    Args:
+        cursor: The psycopg2 cursor to execute the statement with.
+        name (str): The path of the SQL script relative to app/sql/.
+        params (optional): The parameters to pass to the statement.
+
+    Returns:
+        bool: True if the statement was executed, False if it cannot be prepared (either
+              because the script contains several statements or because the connection
+              was not created as a `PreparingConnection`).
+
+    Example:
+        >>> execute_prepared(cursor, "wallets/get-wallet.sql", (1,))
+        True
+    """
+    if not statements:
+        load_statements()
+
+    prepared = prepared_statements.get(name)
+    connection = cursor.connection
+    if prepared is None or not isinstance(connection, PreparingConnection):
+        return False
+
+    prepare, execute = prepared
+    if name not in connection.prepared:
+        cursor.execute(prepare)
+        connection.prepared.add(name)
+
+    cursor.execute(execute, params)
+    return True
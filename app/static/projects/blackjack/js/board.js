@@ -1487,12 +1487,8 @@ class Game {
       const username = document.getElementById("player-1-username").textContent;
 
       // If the loop is on the first player and the players username isn't 'Guest' and it is
-      // not in the tutorial then it will send the game stats to the server.
-      if (i === 0 && username !== "Guest" && tutorial_type === "") {
-        // URL endpoint for the POST request.
-        const live_url = `https://blackjack-flask-app.onrender.com/menu/tables/${table_stakes}-stakes-table`;
-        const url = `http://127.0.0.1:5000/menu/tables/${table_stakes}-stakes-table`;
-
+      // not in the tutorial or practice table then it will send the hand to the server.
+      if (i === 0 && username !== "Guest" && tutorial_type === "" && hand_url !== "") {
         // Create a new FormData object.
         const formData = new FormData();
 
@@ -1512,11 +1508,11 @@ class Game {
         formData.append("profit_loss", bet);
 
         // Send form data to the server and catch any errors.
-        fetch(live_url, {
+        fetch(hand_url, {
           method: "POST",
           body: formData,
         })
-          .then((response) => response.text())
+          .then((response) => response.json())
           .catch((error) => console.error(error));
       }
 
@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from .response_cache import response_cache
 
 # Renders all the routes in a blueprint.
 views = Blueprint("views", __name__)
@@ -9,6 +10,7 @@ views = Blueprint("views", __name__)
 # Menu functions
 # ==============
 @views.route('/')
+@response_cache.cached
 def home():
     """
     Renders the homepage.
@@ -25,6 +27,7 @@ def home():
     )
 
 @views.route('/about')
+@response_cache.cached
 def about():
     """
     Renders the about currently displaying a message that the page is coming soon.
@@ -35,6 +38,7 @@ def about():
     return render_template('menu/about.html')
 
 @views.route('/projects')
+@response_cache.cached
 def projects():
     """
     Renders the projects currently displaying a message that the page is coming soon.
@@ -45,6 +49,7 @@ def projects():
     return render_template('menu/projects.html')
 
 @views.route('/experience')
+@response_cache.cached
 def experience():
     """
     Renders the experience currently displaying a message that the page is coming soon.
@@ -55,6 +60,7 @@ def experience():
     return render_template('menu/experience.html')
 
 @views.route('/contact')
+@response_cache.cached
 def contact():
     """
     Renders the contact currently displaying a message that the page is coming soon.
@@ -65,9 +71,11 @@ def contact():
     return render_template('menu/contact.html')
 
 @views.route('/projects/ivp')
+@response_cache.cached
 def ivp():
     return render_template('projects/ivp/ivp.html')
 
 @views.route('/projects/game-of-life')
+@response_cache.cached
 def gameOfLife():
     return render_template('projects/game-of-life/index.html')
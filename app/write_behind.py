@@ -0,0 +1,341 @@
+import atexit
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Union
+from psycopg2.extras import execute_values
+from .metrics import name_statement
+
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================
+# Write-behind buffer class
+# ==========================
+class WriteBehindBuffer:
+    """
+    Coalesces game stats and wallet updates in memory and writes them to the database in bulk.
+
+    Each game keeps a running total of the hands and profit/loss recorded since the last flush,
+    and each user keeps only their latest wallet value, so the number of rows written by a
+    flush depends on the number of active games rather than the number of hands played.
+
+    A background thread flushes the buffer every `flush_interval` seconds, or sooner once
+    `flush_size` games and wallets are pending. If `max_pending` is reached the request that
+    would exceed it flushes the buffer itself. If that flush fails (e.g. the database is down)
+    the update is refused and the caller writes it directly instead, so the buffer never holds
+    more than `max_pending` games and wallets. The buffer is also flushed when the process
+    exits (gunicorn workers call `close` from the `worker_exit` hook, since they do not always
+    run `atexit` handlers).
+
+    Args:
+        connection_pool: The `ConnectionPool` that flushes check connections out of.
+        get_sql_script (Callable[[str], str]): Gets the SQL script for the given file.
+        flush_interval (float): The number of seconds between flushes.
+        flush_size (int): The number of pending games and wallets that triggers an early flush.
+        max_pending (int): The maximum number of pending games and wallets held in memory.
+
+    Example:
+        >>> buffer = WriteBehindBuffer(connection_pool, get_sql_script, 5.0, 500, 10000)
+        >>> buffer.add_hand(3, 1, 20, 120)
+        True
+        >>> buffer.flush()
+    """
+
+    def __init__(self, connection_pool, get_sql_script: Callable[[str], str],
+                 flush_interval: float, flush_size: int, max_pending: int):
+        self.connection_pool = connection_pool
+        self.get_sql_script = get_sql_script
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+
+        # The pending hands and profit/loss for each game_id and the latest wallet for each user_id.
+        self._games: Dict[int, List[int]] = {}
+        self._wallets: Dict[int, int] = {}
+
+        # The number of games and wallets being written by the flush in progress, which count
+        # towards `max_pending` since they are put back in the buffer if the flush fails.
+        self._in_flight = 0
+
+        # The wallets being written by the flush in progress, which are still newer than the
+        # wallets in the database until the flush commits.
+        self._flushing_wallets: Dict[int, int] = {}
+
+        # The process the flush thread belongs to, and the thread itself.
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+        # Counters describing how much work the buffer has saved.
+        self._hands = 0
+        self._flushes = 0
+        self._rows_written = 0
+        self._failures = 0
+        self._refused = 0
+
+        atexit.register(self.close)
+
+    def _start(self):
+        """
+        Starts the flush thread in the current process, discarding anything buffered before a fork.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+
+            # Updates inherited from the parent process are the parent's to write.
+            self._games = {}
+            self._wallets = {}
+            self._in_flight = 0
+            self._flushing_wallets = {}
+            self._wake = threading.Event()
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def start(self):
+        """
+        Starts the flush thread in the current process now rather than on the first update.
+        """
+        self._start()
+
+    def _run(self):
+        """
+        Flushes the buffer every `flush_interval` seconds, or when woken early, until stopped.
+        """
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _pending(self) -> int:
+        return len(self._games) + len(self._wallets)
+
+    def _fits(self, game_id: Optional[int], user_id: int) -> bool:
+        """
+        Checks an update to the given game and wallet can be buffered without exceeding
+        `max_pending`. Updating a game or wallet that is already pending uses no more memory.
+        Must be called with the lock held.
+        """
+        added = (game_id is not None and game_id not in self._games) + (user_id not in self._wallets)
+        return self._pending() + self._in_flight + added <= self.max_pending
+
+    def add_hand(self, game_id: int, user_id: int, profit_loss: int, wallet: int) -> bool:
+        """
+        Adds a hand to the pending stats of the given game and sets the user's pending wallet.
+
+        Args:
+            game_id (int): The game_id of the game the hand was played in.
+            user_id (int): The user_id of the user who played the hand.
+            profit_loss (int): The profit/loss of the hand.
+            wallet (int): The user's new wallet value.
+
+        Returns:
+            bool: Whether the hand was buffered. If False, the buffer is full and could not be
+                  flushed, and the caller must write the hand to the database itself.
+        """
+        self._start()
+
+        # Flushes in the request thread if adding the hand would exceed the memory cap, and
+        # refuses the hand if the flush fails.
+        for flushed in (False, True):
+            if flushed:
+                self.flush()
+            with self._lock:
+                if self._fits(game_id, user_id):
+                    pending_game = self._games.setdefault(game_id, [0, 0])
+                    pending_game[0] += 1
+                    pending_game[1] += profit_loss
+                    self._wallets[user_id] = wallet
+                    self._hands += 1
+                    pending = self._pending()
+                    break
+        else:
+            with self._lock:
+                self._refused += 1
+            return False
+
+        # Wakes the flush thread early once enough updates have been coalesced.
+        if pending >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def set_wallet(self, user_id: int, wallet: int) -> bool:
+        """
+        Sets the user's pending wallet, replacing any older pending value.
+
+        Args:
+            user_id (int): The user_id of the user whose wallet has changed.
+            wallet (int): The user's new wallet value.
+
+        Returns:
+            bool: Whether the wallet was buffered. If False, the buffer is full and could not
+                  be flushed, and the caller must write the wallet to the database itself.
+                  A pending wallet is always replaced, since that does not use more memory.
+        """
+        self._start()
+        for flushed in (False, True):
+            if flushed:
+                self.flush()
+            with self._lock:
+                if self._fits(None, user_id):
+                    self._wallets[user_id] = wallet
+                    return True
+
+        with self._lock:
+            self._refused += 1
+        return False
+
+    def replace_wallet(self, user_id: int, wallet: int):
+        """
+        Replaces the user's pending wallet, if there is one, e.g. with a wallet that has just
+        been written to the database, so a later flush cannot overwrite it with an older value.
+
+        If the user's wallet is being written by the flush in progress, the flush may commit
+        the older value after the new one, so the new value is buffered again and written by
+        the next flush.
+
+        Args:
+            user_id (int): The user_id of the user whose wallet has changed.
+            wallet (int): The user's new wallet value.
+        """
+        with self._lock:
+            if user_id in self._wallets or user_id in self._flushing_wallets:
+                self._wallets[user_id] = wallet
+
+    def pending_wallet(self, user_id: int) -> Optional[int]:
+        """
+        Gets the user's wallet if an update to it has not yet been written to the database.
+
+        Args:
+            user_id (int): The user_id of the user whose wallet is requested.
+
+        Returns:
+            Optional[int]: The pending wallet value, or None if there is no pending update.
+        """
+        with self._lock:
+            if user_id in self._wallets:
+                return self._wallets[user_id]
+            return self._flushing_wallets.get(user_id)
+
+    def has_pending(self) -> bool:
+        """
+        Checks whether any updates are waiting to be written, including those being written by
+        the flush in progress.
+
+        Returns:
+            bool: True if the buffer is not empty or a flush is in progress.
+        """
+        with self._lock:
+            return self._pending() + self._in_flight > 0
+
+    def flush(self):
+        """
+        Writes every pending update to the database in one transaction. If the write fails the
+        updates are put back in the buffer (unless newer wallet values have been set meanwhile)
+        so they are retried by the next flush. The wallets being written are still returned by
+        `pending_wallet` until the write commits.
+        """
+        with self._flush_lock:
+            # Takes the pending updates, leaving an empty buffer for new hands.
+            with self._lock:
+                games, self._games = self._games, {}
+                wallets, self._wallets = self._wallets, {}
+                self._flushing_wallets = wallets
+                self._in_flight = len(games) + len(wallets)
+
+            if not games and not wallets:
+                return
+
+            try:
+                with self.connection_pool.connection() as connection:
+                    try:
+                        cursor = connection.cursor()
+
+                        # Adds the pending hands to each game's stats.
+                        if games:
+                            name_statement(cursor, "game_stats/flush-game-stats.sql")
+                            execute_values(
+                                cursor,
+                                self.get_sql_script("game_stats/flush-game-stats.sql"),
+                                [(game_id, hands, profit_loss)
+                                 for game_id, (hands, profit_loss) in games.items()]
+                            )
+
+                        # Sets each user's latest wallet.
+                        if wallets:
+                            name_statement(cursor, "wallets/flush-wallets.sql")
+                            execute_values(
+                                cursor,
+                                self.get_sql_script("wallets/flush-wallets.sql"),
+                                list(wallets.items())
+                            )
+
+                        connection.commit()
+                    except Exception:
+                        connection.rollback()
+                        raise
+
+            # Puts the updates back in the buffer so they are not lost.
+            except Exception as e:
+                logger.error("An error occurred writing the buffered game stats and wallets: %s", e)
+                with self._lock:
+                    self._in_flight = 0
+                    self._flushing_wallets = {}
+                    self._failures += 1
+                    for game_id, (hands, profit_loss) in games.items():
+                        pending_game = self._games.setdefault(game_id, [0, 0])
+                        pending_game[0] += hands
+                        pending_game[1] += profit_loss
+                    for user_id, wallet in wallets.items():
+                        self._wallets.setdefault(user_id, wallet)
+                return
+
+            with self._lock:
+                self._in_flight = 0
+                self._flushing_wallets = {}
+                self._flushes += 1
+                self._rows_written += len(games) + len(wallets)
+
+    def close(self):
+        """
+        Stops the flush thread and writes any pending updates. Registered to run at exit, and
+        called by gunicorn workers as they exit.
+        """
+        self._stopped.set()
+        self._wake.set()
+        if self._pid == os.getpid():
+            self.flush()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the buffer's counters.
+
+        Returns:
+            Dict[str, Union[int, float]]: A dictionary containing the following keys:
+                - "pending" (int): The number of games and wallets waiting to be written.
+                - "hands" (int): The number of hands added to the buffer.
+                - "flushes" (int): The number of successful flushes.
+                - "rows_written" (int): The number of rows updated by successful flushes.
+                - "failures" (int): The number of flushes that failed and were retried.
+                - "refused" (int): The number of updates refused because the buffer was full.
+        """
+        with self._lock:
+            return {
+                "pending": self._pending(),
+                "hands": self._hands,
+                "flushes": self._flushes,
+                "rows_written": self._rows_written,
+                "failures": self._failures,
+                "refused": self._refused,
+            }
@@ -0,0 +1,92 @@
+"""
+Verifies and benchmarks the SHA-256 backends of `hash` in app/hash.py.
+
+Each backend is first checked against the NIST test vectors and the hashes stored by the
+original implementation; a backend that fails is reported and not timed. The benchmark then
+reports how many password hashes per second each backend computes, followed by the
+throughput of `hash_batch` with each backend for each batch size (its output is checked
+against `hash` first).
+
+Usage:
+    python benchmarks/bench_hash.py [seconds]
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.hash import HASH_BACKENDS, hash, hash_batch, numpy, verify_backend  # noqa: E402
+
+
+# The batch sizes `hash_batch` is timed with.
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000]
+
+
+def hashes_per_second(backend: str, password: str, salt: str, seconds: float) -> float:
+    """
+    Returns the number of hashes per second computed by the backend over roughly `seconds`.
+    """
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds:
+        for _ in range(10):
+            hash(password, salt, backend=backend)
+        count += 10
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def batch_hashes_per_second(backend: str, credentials: list, seconds: float) -> float:
+    """
+    Returns the number of hashes per second computed by `hash_batch` over roughly `seconds`.
+    """
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds:
+        hash_batch(credentials, backend=backend)
+        count += len(credentials)
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def main(seconds: float):
+    password = "correct horse battery staple"
+    salt = uuid.uuid4().hex
+    failed = False
+
+    print(f"{'backend':>10} {'verified':>10} {'hashes/sec':>14}")
+    for backend in HASH_BACKENDS:
+        failures = verify_backend(backend)
+        if failures:
+            failed = True
+            for failure in failures:
+                print(failure, file=sys.stderr)
+            print(f"{backend:>10} {'no':>10} {'skipped':>14}")
+            continue
+        rate = hashes_per_second(backend, password, salt, seconds)
+        print(f"{backend:>10} {'yes':>10} {rate:14,.0f}")
+
+    # Passwords of varying length, so the batches contain messages of one and two chunks.
+    credentials = [(f"password-{i}" * (1 + i % 4), uuid.uuid4().hex) for i in range(max(BATCH_SIZES))]
+    expected = [hash(password, salt) for password, salt in credentials]
+    for backend in HASH_BACKENDS:
+        if hash_batch(credentials, backend=backend) != expected:
+            print(f"hash_batch with {backend} does not match hash", file=sys.stderr)
+            return 1
+
+    print()
+    print(f"hash_batch (python backend {'with numpy' if numpy is not None else 'without numpy'})")
+    print(f"{'batch size':>10}" + "".join(f" {backend + ' hashes/sec':>25}" for backend in HASH_BACKENDS))
+    for batch_size in BATCH_SIZES:
+        rates = [batch_hashes_per_second(backend, credentials[:batch_size], seconds) for backend in HASH_BACKENDS]
+        print(f"{batch_size:>10}" + "".join(f" {rate:25,.0f}" for rate in rates))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0))
@@ -0,0 +1,102 @@
+"""
+Benchmarks `bottom_up_merge_sort` against `merge_sort` from app/sort.py on sorted, nearly sorted
+(like game history, which arrives in date order), reversed and random input.
+
+Before timing, each input is checked to sort to the same result with both functions, including
+inputs with many equal values. Values that compare equal but can be told apart are checked
+against `sorted` instead, since `merge_sort` takes the right-hand value first on a tie while
+`bottom_up_merge_sort` is stable.
+
+Usage:
+    python benchmarks/bench_merge_sort.py [size ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.sort import bottom_up_merge_sort, merge_sort  # noqa: E402
+
+
+class Item:
+    """
+    A value compared only by its key, so a stable sort can be told apart from an unstable one.
+    """
+
+    def __init__(self, key: int, position: int):
+        self.key = key
+        self.position = position
+
+    def __lt__(self, other: 'Item') -> bool:
+        return self.key < other.key
+
+    def __eq__(self, other: 'Item') -> bool:
+        return self.key == other.key and self.position == other.position
+
+
+def generate_inputs(size: int, seed: int = 0) -> dict[str, list]:
+    """
+    Generates the inputs each function is run on, keyed by a description of their order.
+    """
+    rng = random.Random(seed)
+    nearly_sorted = list(range(size))
+    for _ in range(size // 1000):
+        i = rng.randrange(max(size - 1, 1))
+        nearly_sorted[i:i + 2] = nearly_sorted[i:i + 2][::-1]
+    return {
+        "sorted": list(range(size)),
+        "nearly sorted": nearly_sorted,
+        "reversed": list(range(size, 0, -1)),
+        "random": [rng.random() for _ in range(size)],
+    }
+
+
+def check_results(seed: int = 0):
+    """
+    Checks `bottom_up_merge_sort` returns the same result as `merge_sort` (or, for items with
+    equal keys, the same stable order as `sorted`) and leaves its input unchanged, raising
+    AssertionError otherwise.
+    """
+    rng = random.Random(seed)
+    arrays = [[], [1], [2, 1], [1, 1, 1], [10, 7, 6, 7, 2, 2, 3, 0]]
+    items = []
+    for size in (5, 17, 100, 1000):
+        arrays.extend(generate_inputs(size, seed).values())
+        arrays.append([rng.randint(0, 5) for _ in range(size)])
+        items.append([Item(rng.randint(0, 5), i) for i in range(size)])
+        items.append([Item(size - i // 3, i) for i in range(size)])
+
+    for array in arrays:
+        original = list(array)
+        assert bottom_up_merge_sort(array) == merge_sort(list(array)), array
+        assert array == original, array
+    for array in items:
+        assert bottom_up_merge_sort(array) == sorted(array), [item.key for item in array]
+
+
+def time_call(function, *args, repeat: int = 1) -> float:
+    """
+    Returns the shortest time (in seconds) taken by a call over `repeat` calls.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes: list[int]):
+    check_results()
+    print(f"{'size':>10} {'input':>14} {'bottom-up (s)':>14} {'merge_sort (s)':>15}")
+    for size in sizes:
+        for name, array in generate_inputs(size).items():
+            bottom_up = time_call(bottom_up_merge_sort, array, repeat=3)
+            recursive = time_call(merge_sort, array, repeat=3)
+            print(f"{size:>10} {name:>14} {bottom_up:14.3f} {recursive:15.3f}")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10_000, 200_000])
@@ -0,0 +1,97 @@
+"""
+Benchmarks `sort_rows` from app/sort.py on generated game history.
+
+The previous implementation (which matched each sorted value back to its row with a linear
+scan and `list.remove`) is included for comparison. Being O(n^2), it is only run on the
+smaller sizes.
+
+Usage:
+    python benchmarks/bench_sort.py [rows ...]
+"""
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.sort import merge_sort, sort_rows  # noqa: E402
+
+
+# The largest size the previous implementation is run on.
+LEGACY_LIMIT = 10_000
+
+
+def legacy_sort_rows(rows: list[list], column: int, reverse: bool = False):
+    """
+    The previous `sort_rows`, kept for comparison.
+    """
+    data = [row[column] for row in rows]
+    if column == 5:
+        sorted_data = []
+        for item in ['Low', 'Medium', 'High']:
+            for element in data:
+                if element == item:
+                    sorted_data.append(element)
+    else:
+        sorted_data = merge_sort(data)
+    if reverse:
+        sorted_data.reverse()
+    sorted_rows = []
+    rows_copy = [row[:] for row in rows]
+    for value in sorted_data:
+        for row in rows_copy:
+            if row[column] == value:
+                sorted_rows.append(row)
+                rows_copy.remove(row)
+    return sorted_rows
+
+
+def generate_games(number_of_games: int, seed: int = 0) -> list[list]:
+    """
+    Generates game history rows in the form returned by `get_all_games`, in date order.
+    """
+    rng = random.Random(seed)
+    start = datetime.date(2024, 1, 1)
+    games = []
+    for i in range(number_of_games):
+        hands = rng.randint(1, 60)
+        net_profit_loss = rng.randint(-500, 500)
+        games.append([
+            start + datetime.timedelta(days=i * 365 // max(number_of_games, 1)),
+            datetime.time(rng.randint(0, 23), rng.randint(0, 59)),
+            hands,
+            net_profit_loss,
+            net_profit_loss // hands,
+            rng.choice(['Low', 'Medium', 'High']),
+        ])
+    return games
+
+
+def time_call(function, *args, repeat: int = 1) -> float:
+    """
+    Returns the shortest time (in seconds) taken by a call over `repeat` calls.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes: list[int]):
+    columns = {2: "number_of_hands", 5: "game_table"}
+    print(f"{'rows':>10} {'column':>16} {'sort_rows (s)':>14} {'previous (s)':>14}")
+    for size in sizes:
+        games = generate_games(size)
+        for column, name in columns.items():
+            current = time_call(sort_rows, games, column, True, repeat=3)
+            previous = f"{time_call(legacy_sort_rows, games, column, True):14.3f}" \
+                if size <= LEGACY_LIMIT else f"{'skipped':>14}"
+            print(f"{size:>10} {name:>16} {current:14.3f} {previous}")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [10_000, 1_000_000])
@@ -0,0 +1,48 @@
+import gc
+import os
+
+# ======================
+# Gunicorn configuration
+# ======================
+
+# The application served by `gunicorn` (run from this directory).
+wsgi_app = "main:app"
+
+# Whether the application is created once in the master process and shared with the workers,
+# instead of being imported and created again by every worker. Disable it to reload the code
+# on SIGHUP without restarting the master.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    """
+    Called in the master process once it is ready to fork the workers. With preload_app, the
+    application has been created by now, so the templates are compiled too and every object
+    the master holds is moved out of the garbage collector's reach, so the collector running
+    in a worker does not touch (and copy) the memory pages the workers share.
+    """
+    if not server.cfg.preload_app:
+        return
+
+    from app import preload
+    preload(server.app.wsgi())
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Called in each worker straight after it forks. Creates the resources that belong to a
+    single process: the database connection pool, the write-behind flush thread and the
+    password hashing pool.
+    """
+    from app import db
+    db.init_process()
+
+
+def worker_exit(server, worker):
+    """
+    Called in each worker as it exits. Writes any game stats and wallets still waiting in the
+    write-behind buffer, since a worker does not always run `atexit` handlers.
+    """
+    from app import db
+    db.close_process()